@@ -1,18 +1,35 @@
 import logging
 
 import uvicorn
-from app.config import DEBUG, SYNC_WITH_PANEL, PANEL_USERNAME, PANEL_PASSWORD, PANEL_ADDRESS
-from app.db.db_context import DbContext
+from redis.asyncio import Redis
+from app.config import CHECK_SHARDS, DEBUG, LIMIT_PRELOAD, REDIS_PREFIX, REDIS_URL, STORAGE_TYPE, STORAGE_WINDOW, SYNC_WITH_PANEL, PANEL_USERNAME, PANEL_PASSWORD, PANEL_ADDRESS, PANEL_TYPE
+from app.db import db_context
+from app.db.limit_cache import LimitCache
+from app.db.limit_snapshot import LimitSnapshot
 from app.db.marzneshin_db import MarzneshinDB
+from app.db.rebecca_db import RebeccaDB
 from app.db.models import UserLimit
 from app.models.panel import Panel
+from app.storage.indexed import IndexedMemoryStorage
 from app.storage.memory import MemoryStorage
+from app.storage.redis import RedisStorage
+from app.storage.sharded import ShardedStorage
+from app.storage.windowed import WindowedMemoryStorage
 
 
 __version__ = "0.0.9"
 
-storage = MemoryStorage()
-user_limit_db = DbContext(UserLimit)
+if STORAGE_TYPE == "redis":
+    storage = RedisStorage(Redis.from_url(REDIS_URL, decode_responses=True), STORAGE_WINDOW, REDIS_PREFIX)
+elif CHECK_SHARDS:
+    storage = ShardedStorage(CHECK_SHARDS, STORAGE_WINDOW)
+elif STORAGE_TYPE == "memory":
+    storage = MemoryStorage()
+elif STORAGE_WINDOW:
+    storage = WindowedMemoryStorage(STORAGE_WINDOW)
+else:
+    storage = IndexedMemoryStorage()
+user_limit_db = LimitSnapshot(db_context(UserLimit)) if LIMIT_PRELOAD else LimitCache(db_context(UserLimit))
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG if DEBUG else logging.INFO)
@@ -28,6 +45,6 @@ panel_db = None
 if SYNC_WITH_PANEL:
     try:
         _panel = Panel(username=PANEL_USERNAME, password=PANEL_PASSWORD, domain=PANEL_ADDRESS)
-        panel_db = MarzneshinDB(_panel)
+        panel_db = RebeccaDB(_panel) if PANEL_TYPE == "rebecca" else MarzneshinDB(_panel)
     except Exception as e:
-        logger.error(f"Failed to initialize MarzneshinDB: {e}")
+        logger.error(f"Failed to initialize the panel limits: {e}")
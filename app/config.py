@@ -16,10 +16,40 @@ SQLALCHEMY_CONNECTION_POOL_SIZE = config(
 SQLALCHEMY_CONNECTION_MAX_OVERFLOW = config(
     "SQLALCHEMY_CONNECTION_MAX_OVERFLOW", default=-1, cast=int
 )
+# query the database through the asyncio engine (aiosqlite / asyncmy)
+SQLALCHEMY_ASYNC = config("SQLALCHEMY_ASYNC", default=False, cast=bool)
+# seconds between reloads of the excepted ips, picks up changes made from the cli
+EXCEPTED_IPS_REFRESH_INTERVAL = config(
+    "EXCEPTED_IPS_REFRESH_INTERVAL", default=30, cast=int
+)
 DB_REQUEST_LIMIT_ON_CHECKING = config(
     "DB_REQUEST_LIMIT_ON_CHECKING", default=10, cast=int
 )
 CACHE_TTL = config("CACHE_TTL", default=300, cast=int)
+LIMIT_CACHE_TTL = config("LIMIT_CACHE_TTL", default=CACHE_TTL, cast=int)
+LIMIT_CACHE_SIZE = config("LIMIT_CACHE_SIZE", default=100000, cast=int)
+# keep every user limit in memory, refreshed every LIMIT_REFRESH_INTERVAL seconds
+LIMIT_PRELOAD = config("LIMIT_PRELOAD", default=False, cast=bool)
+LIMIT_REFRESH_INTERVAL = config("LIMIT_REFRESH_INTERVAL", default=10, cast=int)
+
+INGEST_QUEUE_SIZE = config("INGEST_QUEUE_SIZE", cast=int, default=10000)
+INGEST_WORKERS = config("INGEST_WORKERS", cast=int, default=8)
+INGEST_BATCH_SIZE = config("INGEST_BATCH_SIZE", cast=int, default=100)
+# block, drop_new or drop_old
+INGEST_OVERFLOW = config("INGEST_OVERFLOW", default="drop_old")
+# parse log frames in this many worker processes (0 to parse in the main process)
+PARSER_PROCESSES = config("PARSER_PROCESSES", cast=int, default=0)
+
+# memory (legacy list storage), indexed or redis (shared between nobetci instances)
+STORAGE_TYPE = config("STORAGE_TYPE", default="indexed")
+REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+REDIS_PREFIX = config("REDIS_PREFIX", default="nobetci")
+# seconds, forget ips which weren't seen in this window (0 to keep them)
+STORAGE_WINDOW = config("STORAGE_WINDOW", cast=int, default=0)
+# split users and their checks over this many processes (0 to check in the main process)
+CHECK_SHARDS = config("CHECK_SHARDS", cast=int, default=0)
+# seconds the repeated lines of an ip within its user's limit aren't checked again (0 to check every line)
+CHECK_GATE_INTERVAL = config("CHECK_GATE_INTERVAL", cast=float, default=10)
 
 DEFAULT_LIMIT = config("DEFAULT_LIMIT", cast=int, default=0)
 ACCEPTED = config("ACCEPTED", cast=bool, default=False)
@@ -31,13 +61,43 @@ PANEL_CUSTOM_NODES_ENV = config("PANEL_CUSTOM_NODES", default=None)
 PANEL_CUSTOM_NODES = PANEL_CUSTOM_NODES_ENV and [
     x.strip() for x in PANEL_CUSTOM_NODES_ENV.split(",") if x.strip()] or None
 PANEL_NODE_RESET = config("PANEL_NODE_RESET", cast=int, default=8192)
+# seconds between comparisons of the panel's nodes with the running log streams
+PANEL_NODE_SYNC_INTERVAL = config("PANEL_NODE_SYNC_INTERVAL", cast=int, default=60)
+# log streams: reconnect delays (seconds, doubled per failure up to the max),
+# failures in a row before a node is reported down and then tried every cooldown
+STREAM_BACKOFF_BASE = config("STREAM_BACKOFF_BASE", cast=float, default=1)
+STREAM_BACKOFF_MAX = config("STREAM_BACKOFF_MAX", cast=float, default=60)
+STREAM_BREAKER_THRESHOLD = config("STREAM_BREAKER_THRESHOLD", cast=int, default=8)
+STREAM_BREAKER_COOLDOWN = config("STREAM_BREAKER_COOLDOWN", cast=float, default=300)
+# seconds between two telegram notifications about the same stream
+STREAM_NOTIFY_INTERVAL = config("STREAM_NOTIFY_INTERVAL", cast=int, default=600)
+# connections kept open to the panel api
+PANEL_MAX_CONNECTIONS = config("PANEL_MAX_CONNECTIONS", cast=int, default=20)
+# seconds before a panel token expires that it's renewed, and how long a
+# token without an exp claim is kept
+PANEL_TOKEN_REFRESH_MARGIN = config("PANEL_TOKEN_REFRESH_MARGIN", cast=int, default=60)
+PANEL_TOKEN_TTL = config("PANEL_TOKEN_TTL", cast=int, default=3600)
 PANEL_TYPE = config("PANEL_TYPE", default="marzneshin")
 SYNC_WITH_PANEL = config("SYNC_WITH_PANEL", cast=bool, default=False)
+# seconds between syncs of every user limit from the panel, users per request
+PANEL_SYNC_INTERVAL = config("PANEL_SYNC_INTERVAL", cast=int, default=120)
+PANEL_SYNC_PAGE_SIZE = config("PANEL_SYNC_PAGE_SIZE", cast=int, default=500)
+# seconds a lookup waits for a user the sync hasn't seen, users fetched at once
+PANEL_LIMIT_TIMEOUT = config("PANEL_LIMIT_TIMEOUT", cast=float, default=5)
+PANEL_REFRESH_CONCURRENCY = config("PANEL_REFRESH_CONCURRENCY", cast=int, default=8)
 MARZNESHIN_SERVICES = config("MARZNESHIN_SERVICES", default="")
 
 BAN_INTERVAL = config("BAN_INTERVAL", cast=int, default=300)
+# bans are sent to all nodes at once, with a timeout per node
+NODE_REQUEST_TIMEOUT = config("NODE_REQUEST_TIMEOUT", cast=float, default=5)
+NODE_REQUEST_CONCURRENCY = config(
+    "NODE_REQUEST_CONCURRENCY", cast=int, default=32)
+# ban requests kept per node while it's unreachable, the oldest are dropped past it
+NODE_OUTBOX_SIZE = config("NODE_OUTBOX_SIZE", cast=int, default=1000)
 STL = config("STL", cast=int, default=10)
 IUL = config("IUL", cast=int, default=50)
+# seconds, forget repeated out of limit counts older than this (0 to keep them)
+REPEAT_DECAY = config("REPEAT_DECAY", cast=int, default=600)
 BAN_LAST_USER = config("BAN_LAST_USER", cast=bool, default=False)
 
 API_USERNAME = config("API_USERNAME", default=None)
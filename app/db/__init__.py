@@ -1,4 +1,6 @@
+from app.config import SQLALCHEMY_ASYNC
 from app.db.db_context import DbContext
+from app.db.excepted_ip_set import ExceptedIPSet
 from . import models
 from sqlalchemy.exc import SQLAlchemyError
 from app.db.base import Base, SessionLocal
@@ -7,9 +9,18 @@ from app.db.base import Base, SessionLocal
 from .db_base import DBBase
 
 
+def db_context(model) -> DBBase:
+    """Context for the server process, AsyncDbContext with SQLALCHEMY_ASYNC
+    so queries don't block the event loop. The CLI uses DbContext directly"""
+    if SQLALCHEMY_ASYNC:
+        from app.db.async_db_context import AsyncDbContext
+        return AsyncDbContext(model)
+    return DbContext(model)
+
+
 tls_db: DBBase = DbContext(models.TLS)
-node_db: DBBase = DbContext(models.Node)
-excepted_ips: DBBase = DbContext(models.ExceptedIP)
+node_db: DBBase = db_context(models.Node)
+excepted_ips = ExceptedIPSet(db_context(models.ExceptedIP))
 
 
 class GetDB:  # Context Manager
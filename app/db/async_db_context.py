@@ -0,0 +1,94 @@
+from typing import Generic, Type, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeMeta
+
+from app.config import SQLALCHEMY_CONNECTION_MAX_OVERFLOW, SQLALCHEMY_CONNECTION_POOL_SIZE, SQLALCHEMY_DATABASE_URL
+from app.db.db_base import DBBase
+
+T = TypeVar("T", bound=DeclarativeMeta)
+
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "mysql": "asyncmy",
+    "mariadb": "asyncmy",
+}
+
+
+def async_database_url(url: str) -> str:
+    """sqlite:///db -> sqlite+aiosqlite:///db, mysql+pymysql://... ->
+    mysql+asyncmy://..., urls that already name an async driver are kept"""
+    scheme, separator, rest = url.partition("://")
+    dialect, _, driver = scheme.partition("+")
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"no async driver known for {dialect}")
+    if driver in ASYNC_DRIVERS.values():
+        return url
+    return f"{dialect}+{ASYNC_DRIVERS[dialect]}{separator}{rest}"
+
+
+ASYNC_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=SQLALCHEMY_CONNECTION_POOL_SIZE,
+        max_overflow=SQLALCHEMY_CONNECTION_MAX_OVERFLOW,
+        pool_recycle=3600,
+        pool_timeout=10,
+    )
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False)
+
+
+class AsyncDbContext(DBBase, Generic[T]):
+    """DbContext on the asyncio engine, every method is a coroutine and
+    runs in its own session so concurrent calls don't share one"""
+
+    def __init__(self, model: Type[T]):
+        self.model = model
+
+    def _first(self, condition: callable):
+        return select(self.model).where(condition).limit(1)
+
+    def save(self) -> None:
+        ""
+
+    async def add(self, data):
+        async with AsyncSessionLocal() as session:
+            obj = self.model(**data)
+            session.add(obj)
+            await session.commit()
+            await session.refresh(obj)
+            return obj
+
+    async def delete(self, condition: callable):
+        async with AsyncSessionLocal() as session:
+            instance = await session.scalar(self._first(condition))
+            if instance:
+                await session.delete(instance)
+                await session.commit()
+            return instance
+
+    async def update(self, condition: callable, data):
+        async with AsyncSessionLocal() as session:
+            instance = await session.scalar(self._first(condition))
+            if instance:
+                for key, value in data.items():
+                    if hasattr(instance, key):
+                        setattr(instance, key, value)
+                await session.commit()
+                await session.refresh(instance)
+            return instance
+
+    async def get(self, condition: callable):
+        async with AsyncSessionLocal() as session:
+            return await session.scalar(self._first(condition))
+
+    async def get_all(self, condition: callable):
+        async with AsyncSessionLocal() as session:
+            return (await session.scalars(select(self.model).where(condition))).all()
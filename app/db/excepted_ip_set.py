@@ -0,0 +1,124 @@
+import asyncio
+import inspect
+import ipaddress
+import logging
+import socket
+
+from app.config import EXCEPTED_IPS_REFRESH_INTERVAL
+from app.db.base import SessionLocal
+from app.db.db_base import DBBase
+from app.db.models import ExceptedIP
+
+logger = logging.getLogger(__name__)
+
+_V4_MAPPED_PREFIX = bytes(10) + b"\xff\xff"
+
+
+class ExceptedIPSet(DBBase):
+    """Excepted ips held in memory in front of any DBBase.
+
+    Plain addresses are kept in a set of strings, so the common lookup is
+    one hash probe. CIDR ranges (e.g. 10.0.0.0/8, 2001:db8::/32) are kept
+    as the network part of the address in one set per prefix length, a
+    lookup masks the address once per prefix length in use. The set is
+    loaded on first use and reloaded every `interval` seconds, so changes
+    made from the CLI show up without a restart."""
+
+    def __init__(self, db: DBBase, interval: int = EXCEPTED_IPS_REFRESH_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self.ips: set[str] | None = None
+        # ip version -> prefix length -> network parts, longest prefix first
+        self.networks: dict[int, dict[int, set[int]]] = {4: {}, 6: {}}
+
+    def load(self):
+        # a fresh session, a long lived one may not see commits of the cli
+        with SessionLocal() as session:
+            rows = session.query(ExceptedIP.ip).all()
+
+        ips = set()
+        networks = {4: {}, 6: {}}
+        for ip, in rows:
+            try:
+                network = ipaddress.ip_network(ip.strip(), strict=False)
+            except ValueError:
+                logger.warning(f"skipping invalid excepted ip {ip}")
+                continue
+            if network.num_addresses == 1:
+                ips.add(str(network.network_address))
+                continue
+            shift = network.max_prefixlen - network.prefixlen
+            networks[network.version].setdefault(network.prefixlen, set()).add(
+                int(network.network_address) >> shift)
+
+        self.ips = ips
+        self.networks = {version: dict(sorted(prefixes.items(), reverse=True))
+                         for version, prefixes in networks.items()}
+
+    async def reload(self):
+        await asyncio.to_thread(self.load)
+
+    async def run_refresher(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload()
+            except Exception as error:
+                logger.error(f"failed to reload excepted ips: {error}")
+
+    def contains(self, ip: str) -> bool:
+        if ip in self.ips:
+            return True
+        if not self.networks[4] and not self.networks[6]:
+            return False
+        try:
+            packed = socket.inet_pton(socket.AF_INET, ip)
+        except OSError:
+            try:
+                packed = socket.inet_pton(socket.AF_INET6, ip)
+            except OSError:
+                return False
+            if packed[:12] == _V4_MAPPED_PREFIX:
+                packed = packed[12:]
+        value = int.from_bytes(packed)
+        bits = len(packed) * 8
+        for prefixlen, parts in self.networks[4 if bits == 32 else 6].items():
+            if value >> (bits - prefixlen) in parts:
+                return True
+        return False
+
+    async def is_excepted(self, ip: str) -> bool:
+        if self.ips is None:
+            await self.reload()
+        return self.contains(ip)
+
+    def _write(self, result):
+        if inspect.isawaitable(result):
+            return self._write_after(result)
+        if self.ips is not None:
+            self.load()
+        return result
+
+    async def _write_after(self, result):
+        result = await result
+        if self.ips is not None:
+            await self.reload()
+        return result
+
+    def save(self) -> None:
+        return self.db.save()
+
+    def add(self, data):
+        return self._write(self.db.add(data))
+
+    def delete(self, condition: callable):
+        return self._write(self.db.delete(condition))
+
+    def update(self, condition: callable, data):
+        return self._write(self.db.update(condition, data))
+
+    def get(self, condition: callable):
+        return self.db.get(condition)
+
+    def get_all(self, condition: callable):
+        return self.db.get_all(condition)
@@ -0,0 +1,114 @@
+import inspect
+import operator
+
+from cachetools import TTLCache
+
+from app.config import LIMIT_CACHE_SIZE, LIMIT_CACHE_TTL
+from app.db.db_base import DBBase
+from app.models.user import UserLimit
+
+_MISSING = object()
+
+
+class LimitCache(DBBase):
+    """Write-through cache of user limits in front of any DBBase.
+
+    `get(UserLimit.name == name)` lookups are cached for `ttl` seconds,
+    least recently used names are evicted past `maxsize`. Unknown users
+    are cached too (as None), so repeated lookups of users without a limit
+    don't reach the database. add/update/delete go to the wrapped db and
+    refresh the cached entry of the name they touched, that covers the
+    /users routes and the Telegram bot. The CLI writes to the database
+    from its own process and calls DELETE /api/users/cache/{name}
+    (invalidate()) afterwards, if the service can't be reached the
+    change shows up once the entry expires."""
+
+    def __init__(self, db: DBBase, ttl: int = LIMIT_CACHE_TTL, maxsize: int = LIMIT_CACHE_SIZE):
+        self.db = db
+        self.cache: TTLCache[str, UserLimit | None] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _name(condition) -> str | None:
+        if getattr(condition, "operator", None) is not operator.eq:
+            return None
+        if getattr(getattr(condition, "left", None), "key", None) != "name":
+            return None
+        return getattr(condition.right, "value", condition.right)
+
+    def _store(self, name: str, result) -> UserLimit | None:
+        user_limit = result and UserLimit(name=result.name, limit=result.limit)
+        self.cache[name] = user_limit
+        return user_limit
+
+    async def _store_after(self, name: str, result) -> UserLimit | None:
+        return self._store(name, await result)
+
+    def _write(self, name: str | None, result, forget: bool = False):
+        """Caches the row a write returned, or forgets the name when there
+        is no row (or it was deleted). Unknown names clear the whole cache"""
+        if inspect.isawaitable(result):
+            return self._write_after(name, result, forget)
+        if name is None:
+            self.cache.clear()
+        elif forget or result is None:
+            self.cache.pop(name, None)
+        else:
+            self._store(name, result)
+        return result
+
+    async def _write_after(self, name: str | None, result, forget: bool):
+        return self._write(name, await result, forget)
+
+    def invalidate(self, name: str | None = None):
+        """Forgets the cached limit of `name`, or every cached limit"""
+        if name is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(name, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.cache.currsize,
+            "maxsize": self.cache.maxsize,
+            "ttl": self.cache.ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+    def save(self) -> None:
+        return self.db.save()
+
+    def add(self, data):
+        return self._write(data.get("name"), self.db.add(data))
+
+    def delete(self, condition: callable):
+        return self._write(self._name(condition), self.db.delete(condition), forget=True)
+
+    def update(self, condition: callable, data):
+        return self._write(self._name(condition), self.db.update(condition, data))
+
+    def get(self, condition: callable):
+        name = self._name(condition)
+        if name is None:
+            return self.db.get(condition)
+
+        user_limit = self.cache.get(name, _MISSING)
+        if user_limit is not _MISSING:
+            if user_limit is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return user_limit
+
+        self.misses += 1
+        result = self.db.get(condition)
+        if inspect.isawaitable(result):
+            return self._store_after(name, result)
+        return self._store(name, result)
+
+    def get_all(self, condition: callable):
+        return self.db.get_all(condition)
@@ -0,0 +1,132 @@
+import asyncio
+import inspect
+import logging
+import operator
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app.config import LIMIT_REFRESH_INTERVAL
+from app.db.base import SessionLocal
+from app.db.db_base import DBBase
+from app.db.models import UserLimit as DbUserLimit
+from app.models.user import UserLimit
+
+logger = logging.getLogger(__name__)
+
+
+class LimitSnapshot(DBBase):
+    """All user limits held in a dict, `get(UserLimit.name == name)` is a
+    dictionary read once the snapshot is loaded.
+
+    The snapshot is refreshed every `interval` seconds: rows whose
+    updated_at passed the last watermark are applied, and when the number
+    of names in the table doesn't match the snapshot anymore (a row was
+    deleted) the whole table is reloaded. Writes made through this
+    instance are applied right away, writes from other processes (CLI)
+    show up after at most `interval` seconds, or once invalidate() is
+    called."""
+
+    def __init__(self, db: DBBase, interval: int = LIMIT_REFRESH_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self.limits: dict[str, UserLimit] | None = None
+        self.refreshed_at: datetime | None = None
+        self._watermark: datetime | None = None
+
+    @staticmethod
+    def _name(condition) -> str | None:
+        if getattr(condition, "operator", None) is not operator.eq:
+            return None
+        if getattr(getattr(condition, "left", None), "key", None) != "name":
+            return None
+        return getattr(condition.right, "value", condition.right)
+
+    def load(self):
+        with SessionLocal() as session:
+            rows = session.query(
+                DbUserLimit.name, DbUserLimit.limit, DbUserLimit.updated_at).all()
+
+        self.limits = {name: UserLimit(name=name, limit=limit)
+                       for name, limit, _ in rows}
+        self._watermark = max(
+            (updated_at for *_, updated_at in rows if updated_at), default=None)
+        self.refreshed_at = datetime.now()
+        logger.info(f"loaded {len(self.limits)} user limits")
+
+    def refresh(self):
+        if self.limits is None:
+            return self.load()
+
+        with SessionLocal() as session:
+            query = session.query(
+                DbUserLimit.name, DbUserLimit.limit, DbUserLimit.updated_at)
+            if self._watermark is not None:
+                # >= because rows updated in the same second may have been missed
+                query = query.filter(DbUserLimit.updated_at >= self._watermark)
+            rows = query.all()
+            names_count = session.query(
+                func.count(func.distinct(DbUserLimit.name))).scalar()
+
+        for name, limit, updated_at in rows:
+            self.limits[name] = UserLimit(name=name, limit=limit)
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        if names_count != len(self.limits):
+            return self.load()
+        self.refreshed_at = datetime.now()
+
+    async def invalidate(self, name: str | None = None):
+        """Applies the rows changed since the last refresh right away"""
+        await asyncio.to_thread(self.refresh)
+
+    async def run_refresher(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as error:
+                logger.error(f"failed to refresh user limits: {error}")
+            await asyncio.sleep(self.interval)
+
+    def _apply(self, name: str | None, result, deleted: bool = False):
+        if inspect.isawaitable(result):
+            return self._apply_after(name, result, deleted)
+        if self.limits is not None and name is not None:
+            if deleted or result is None:
+                self.limits.pop(name, None)
+            else:
+                self.limits[name] = UserLimit(name=result.name, limit=result.limit)
+        return result
+
+    async def _apply_after(self, name: str | None, result, deleted: bool):
+        return self._apply(name, await result, deleted)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.limits or {}),
+            "loaded": self.limits is not None,
+            "refreshed_at": self.refreshed_at,
+            "interval": self.interval,
+        }
+
+    def save(self) -> None:
+        return self.db.save()
+
+    def add(self, data):
+        return self._apply(data.get("name"), self.db.add(data))
+
+    def delete(self, condition: callable):
+        return self._apply(self._name(condition), self.db.delete(condition), deleted=True)
+
+    def update(self, condition: callable, data):
+        return self._apply(self._name(condition), self.db.update(condition, data))
+
+    def get(self, condition: callable):
+        name = self._name(condition)
+        if name is None or self.limits is None:
+            return self.db.get(condition)
+        return self.limits.get(name)
+
+    def get_all(self, condition: callable):
+        return self.db.get_all(condition)
@@ -1,17 +1,15 @@
 import logging
-from app.config import CACHE_TTL, MARZNESHIN_SERVICES
-from app.db.db_base import DBBase
+from app.config import MARZNESHIN_SERVICES
+from app.db.panel_db import PanelDB
 from app.models.panel import Panel
 from app.models.user import UserLimit
-from app.utils.panel.marzneshin_panel import get_user
-from cachetools import TTLCache
+from app.utils.panel.marzneshin_panel import get_user, get_users_page
 
 logger = logging.getLogger(__name__)
 
-class MarzneshinDB(DBBase):
+class MarzneshinDB(PanelDB):
     def __init__(self, panel: Panel):
-        self.panel = panel
-        self.cache = TTLCache(maxsize=100000, ttl=CACHE_TTL)
+        super().__init__(panel)
         self.services_limit = self._parse_services(MARZNESHIN_SERVICES)
 
     def _parse_services(self, services_str: str) -> dict:
@@ -27,32 +25,15 @@ class MarzneshinDB(DBBase):
             logger.error(f"Failed to parse MARZNESHIN_SERVICES: {e}")
         return limits
 
-    def save(self) -> None:
-        pass
+    async def _get_user(self, username: str):
+        return await get_user(username, self.panel)
 
-    def add(self, data):
-        pass
+    async def _get_users_page(self, offset: int, size: int):
+        return await get_users_page(self.panel, offset, size)
 
-    def delete(self, condition: callable):
-        pass
-
-    def update(self, condition: callable, data):
-        pass
-
-    async def get(self, condition: callable):
-        username = getattr(condition.right, "value", condition.right)
-
-        if username in self.cache:
-            return UserLimit(name=self.cache[username].name, limit=self.cache[username].limit)
-
-        self.cache[username] = UserLimit(name=username, limit=0)
-
-        user_data = await get_user(username, self.panel)
-        
+    def _user_limit(self, username: str, user_data: dict | None) -> UserLimit:
         if not user_data:
-            user_limit = UserLimit(name=username, limit=0)
-            self.cache[username] = user_limit
-            return user_limit
+            return UserLimit(name=username, limit=0)
 
         service_ids = user_data.get("service_ids", [])
         if not isinstance(service_ids, list):
@@ -67,12 +48,6 @@ class MarzneshinDB(DBBase):
                 found_service = sid
                 break
 
-        user_limit = UserLimit(name=username, limit=limit)
-        self.cache[username] = user_limit
-        
         if limit > 0:
             logger.debug(f"Synced user {username} (Services: {service_ids}) -> Matched Service: {found_service} -> Limit: {limit}")
-        return UserLimit(name=user_limit.name, limit=user_limit.limit)
-
-    def get_all(self, condition: callable):
-        pass
+        return UserLimit(name=username, limit=limit)
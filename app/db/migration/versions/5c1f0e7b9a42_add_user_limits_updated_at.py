@@ -0,0 +1,34 @@
+"""add user_limits updated_at
+
+Revision ID: 5c1f0e7b9a42
+Revises: d73b2ada2379
+Create Date: 2026-10-17 10:12:31.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f0e7b9a42'
+down_revision: Union[str, Sequence[str], None] = 'd73b2ada2379'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user_limits', sa.Column(
+        'updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE user_limits SET updated_at = CURRENT_TIMESTAMP")
+    op.create_index(op.f('ix_user_limits_updated_at'),
+                    'user_limits', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_limits_updated_at'), table_name='user_limits')
+    with op.batch_alter_table('user_limits') as batch_op:
+        batch_op.drop_column('updated_at')
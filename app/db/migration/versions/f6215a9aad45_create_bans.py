@@ -0,0 +1,38 @@
+"""create bans
+
+Revision ID: f6215a9aad45
+Revises: 5c1f0e7b9a42
+Create Date: 2026-10-17 16:20:11.402318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6215a9aad45'
+down_revision: Union[str, Sequence[str], None] = '5c1f0e7b9a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('bans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ip', sa.String(length=128), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('nodes', sa.JSON(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ip')
+    )
+    op.create_index(op.f('ix_bans_expires_at'), 'bans', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_bans_expires_at'), table_name='bans')
+    op.drop_table('bans')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import JSON, Column, DateTime, Integer, String, func
 
 from app.db.base import Base
 
@@ -9,6 +9,8 @@ class UserLimit(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(64), nullable=False)
     limit = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=func.now(),
+                        onupdate=func.now(), index=True)
 
 class Node(Base):
     __tablename__ = "nodes"
@@ -32,3 +34,12 @@ class ExceptedIP(Base):
 
     id = Column(Integer, primary_key=True)
     ip = Column(String(128), nullable=False)
+
+class Ban(Base):
+    __tablename__ = "bans"
+
+    id = Column(Integer, primary_key=True)
+    ip = Column(String(128), nullable=False, unique=True)
+    name = Column(String(64), nullable=False)
+    nodes = Column(JSON, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
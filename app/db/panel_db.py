@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from abc import abstractmethod
+
+from cachetools import TTLCache
+
+from app.config import (CACHE_TTL, PANEL_LIMIT_TIMEOUT, PANEL_REFRESH_CONCURRENCY,
+                        PANEL_SYNC_INTERVAL, PANEL_SYNC_PAGE_SIZE)
+from app.db.db_base import DBBase
+from app.models.panel import Panel
+from app.models.user import UserLimit
+
+logger = logging.getLogger(__name__)
+
+# seconds a user whose fetch failed isn't fetched again
+_RETRY_AFTER = 30
+
+
+class PanelDB(DBBase):
+    """User limits read from the panel (SYNC_WITH_PANEL).
+
+    sync() pages through the panel's user list and caches the limit of
+    every user in one pass, it runs at startup and every `interval`
+    seconds. Users the last sync didn't see are fetched one at a time, a
+    user already being fetched isn't fetched again, the callers wait for
+    that request.
+
+    Limits older than `ttl` are stale: they're still returned, and the
+    user is fetched again in the background. A user seen for the first
+    time is waited for at most `timeout` seconds, then (or when the panel
+    can't be reached) the lookup returns None and DEFAULT_LIMIT applies
+    until the fetch succeeds. At most `concurrency` users are fetched at
+    once. Subclasses fetch the panel's users and map them to limits."""
+
+    def __init__(self, panel: Panel, interval: int = PANEL_SYNC_INTERVAL,
+                 page_size: int = PANEL_SYNC_PAGE_SIZE, ttl: int = CACHE_TTL,
+                 timeout: float = PANEL_LIMIT_TIMEOUT,
+                 concurrency: int = PANEL_REFRESH_CONCURRENCY):
+        self.panel = panel
+        self.interval = interval
+        self.page_size = page_size
+        # synced limits don't go stale between two syncs
+        self.ttl = max(ttl, 2 * interval)
+        self.timeout = timeout
+        # name -> (limit, fetched at)
+        self.limits: dict[str, tuple[UserLimit, float]] = {}
+        self._fetching: dict[str, asyncio.Future] = {}
+        self._failed = TTLCache(maxsize=100000, ttl=_RETRY_AFTER)
+        self._requests = asyncio.Semaphore(concurrency)
+        self.synced = 0
+        self.fetched = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    @abstractmethod
+    async def _get_user(self, username: str) -> dict | None:
+        ""
+
+    @abstractmethod
+    async def _get_users_page(self, offset: int, size: int) -> tuple[list[dict], int]:
+        """One page of the panel's users and the total number of users"""
+
+    @abstractmethod
+    def _user_limit(self, username: str, user: dict | None) -> UserLimit:
+        ""
+
+    async def sync(self) -> int:
+        started = time.monotonic()
+        offset = 0
+        while True:
+            users, total = await self._get_users_page(offset, self.page_size)
+            now = time.monotonic()
+            for user in users:
+                user_limit = self._user_limit(user["username"], user)
+                self.limits[user_limit.name] = (user_limit, now)
+            offset += len(users)
+            if not users or offset >= total:
+                break
+        # users which are gone from the panel
+        for name in [name for name, (_, fetched_at) in self.limits.items()
+                     if fetched_at < started]:
+            del self.limits[name]
+        self.synced = offset
+        logger.info(f"synced the limits of {offset} users from the panel")
+        return offset
+
+    async def initial_sync(self):
+        try:
+            await self.sync()
+        except Exception as error:
+            logger.error(f"failed to sync user limits from the panel: {error}")
+
+    async def run_sync(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.initial_sync()
+
+    async def _fetch(self, username: str) -> UserLimit:
+        try:
+            async with self._requests:
+                user_limit = self._user_limit(username, await self._get_user(username))
+        except Exception as error:
+            self.failures += 1
+            self._failed[username] = True
+            logger.error(f"failed to fetch the limit of {username}: {error}")
+            raise
+        finally:
+            del self._fetching[username]
+        self.fetched += 1
+        self.limits[username] = (user_limit, time.monotonic())
+        return user_limit
+
+    def _refresh(self, username: str) -> asyncio.Future:
+        future = self._fetching.get(username)
+        if future is None:
+            future = self._fetching[username] = asyncio.ensure_future(
+                self._fetch(username))
+            # the callers got the error, if any were still waiting
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def get(self, condition: callable):
+        username = getattr(condition.right, "value", condition.right)
+
+        cached = self.limits.get(username)
+        if cached is not None:
+            user_limit, fetched_at = cached
+            if time.monotonic() - fetched_at < self.ttl:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                if username not in self._failed:
+                    self._refresh(username)
+            return UserLimit(name=user_limit.name, limit=user_limit.limit)
+
+        self.misses += 1
+        if username in self._failed:
+            return None
+        try:
+            user_limit = await asyncio.wait_for(
+                asyncio.shield(self._refresh(username)), self.timeout)
+        except Exception:
+            return None
+        return UserLimit(name=user_limit.name, limit=user_limit.limit)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.limits),
+            "ttl": self.ttl,
+            "synced": self.synced,
+            "fetched": self.fetched,
+            "fetching": len(self._fetching),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
+
+    def save(self) -> None:
+        pass
+
+    def add(self, data):
+        pass
+
+    def delete(self, condition: callable):
+        pass
+
+    def update(self, condition: callable, data):
+        pass
+
+    def get_all(self, condition: callable):
+        pass
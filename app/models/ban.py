@@ -0,0 +1,12 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class Ban(BaseModel):
+    ip: str
+    name: str
+    nodes: list[int]
+    expires_at: datetime
+    # nodes the ban is queued for, not kept in the database
+    pending: list[int] = []
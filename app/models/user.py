@@ -1,3 +1,4 @@
+import sys
 from typing import TYPE_CHECKING
 
 from pydantic import BaseModel
@@ -27,6 +28,36 @@ class User(BaseModel):
     count: int
 
 
+class ConnectionEvent:
+    """A user connection parsed from the logs, used instead of User from
+    the parser to the storage: it's built for every log line and kept for
+    every tracked ip, so it's slotted and not validated. Node and inbound
+    names repeat on every line and are interned. to_user() converts it
+    for the api"""
+
+    __slots__ = ("name", "ip", "inbound", "accepted", "node", "count")
+
+    def __init__(self, name: str, ip: str, inbound: str | None = None,
+                 accepted: str | None = None, node: str | None = None, count: int = 0):
+        self.name = sys.intern(name)
+        self.ip = ip
+        self.inbound = sys.intern(inbound) if inbound else inbound
+        self.accepted = accepted
+        self.node = sys.intern(node) if node else node
+        self.count = count
+
+    @property
+    def status(self) -> UserStatus:
+        return UserStatus.ACTIVE
+
+    def __repr__(self) -> str:
+        return f"ConnectionEvent(name={self.name!r}, ip={self.ip!r}, node={self.node!r})"
+
+    def to_user(self) -> User:
+        return User(name=self.name, status=self.status, inbound=self.inbound,
+                    accepted=self.accepted, node=self.node, ip=self.ip, count=self.count)
+
+
 class AddUser(BaseModel):
     name: str
     limit: int
@@ -14,10 +14,15 @@ from app.tasks.marzneshin import start_marznode_tasks
 from app.tasks.pasarguard import start_pg_node_tasks
 from app.tasks.rebecca import start_rebecca_node_tasks
 from app.telegram_bot import build_telegram_bot
+from app.db import excepted_ips
+from app.db.limit_snapshot import LimitSnapshot
+from app.service.ban_registry import ban_registry
+from app.utils.panel.client import close_clients
+from app.storage.windowed import WindowedMemoryStorage
 
-from . import __version__
+from . import __version__, storage, user_limit_db
 
-from app.config import (DEBUG, DOCS, PANEL_TYPE,
+from app.config import (DEBUG, DOCS, PANEL_TYPE, SQLALCHEMY_ASYNC,
                         UVICORN_HOST, UVICORN_PORT, UVICORN_SSL_CERTFILE, UVICORN_SSL_KEYFILE, UVICORN_UDS)
 from app.routes import api_router
 
@@ -31,6 +36,17 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     asyncio.create_task(build_telegram_bot())
 
+    if isinstance(storage, WindowedMemoryStorage):
+        asyncio.create_task(storage.run_sweeper())
+
+    if isinstance(user_limit_db, LimitSnapshot):
+        asyncio.create_task(user_limit_db.run_refresher())
+
+    asyncio.create_task(excepted_ips.run_refresher())
+
+    await asyncio.to_thread(ban_registry.load)
+    asyncio.create_task(ban_registry.run_expirer())
+
     if PANEL_TYPE == "marzneshin":
         asyncio.create_task(start_marznode_tasks())
     elif PANEL_TYPE == "rebecca":
@@ -42,6 +58,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     yield
 
+    await close_clients()
+
+    if SQLALCHEMY_ASYNC:
+        from app.db.async_db_context import async_engine
+        await async_engine.dispose()
+
 # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 app = FastAPI(
@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 
 from app.models.user import User
 
+# message of the results of requests waiting in a node's outbox
+QUEUED = "queued"
+
 
 class NobetNodeBase(ABC):
 
@@ -12,3 +15,13 @@ class NobetNodeBase(ABC):
     @abstractmethod
     async def UnBanUser(self, user: User):
         pass
+
+    async def BanUsers(self, users: list[User], duration=None, on_delivered=None) -> list:
+        """Bans users one by one, nodes with a batch call override this.
+        Returns one result per user, in order. Nodes that queue requests
+        answer QUEUED and call `on_delivered` with the results once the
+        request was sent, or with None when it was dropped"""
+        return [await self.BanUser(user, duration) for user in users]
+
+    async def UnBanUsers(self, users: list[User], on_delivered=None) -> list:
+        return [await self.UnBanUser(user) for user in users]
@@ -1,23 +1,38 @@
 import asyncio
 import atexit
+import itertools
 import logging
 import ssl
 import tempfile
 
-from app.config import BAN_INTERVAL
+from collections import deque
+
+from app.config import BAN_INTERVAL, NODE_OUTBOX_SIZE
 from app.models.node import Node, NodeStatus
 from app.models.user import User
 from app.nobetnode.nobetnode_grpc import NobetServiceStub
 from grpclib.client import Channel
-from app.nobetnode.base import NobetNodeBase
+from grpclib.const import Status
+from grpclib.exceptions import GRPCError
+from app.nobetnode.base import QUEUED, NobetNodeBase
 from app.notification.telegram import send_notification
-from .nobetnode_pb2 import User as PB2_User
+from .nobetnode_pb2 import BanRequest, Result, User as PB2_User, Users as PB2_Users
 from app.db import node_db
+from app.utils.awaitable import maybe_await
 from app.db.models import Node as DbNode
 
 
 logger = logging.getLogger(__name__)
 
+# seconds a request on the ban stream may stay unanswered
+_ACK_TIMEOUT = 10
+
+
+def _unimplemented(error: GRPCError) -> bool:
+    # grpclib servers answer unknown methods without a content-type,
+    # which the client reports as UNKNOWN instead of UNIMPLEMENTED
+    return error.status == Status.UNIMPLEMENTED or error.message == "Missing content-type header"
+
 
 def string_to_temp_file(content: str):
     file = tempfile.NamedTemporaryFile(mode="w+t")
@@ -51,10 +66,20 @@ class NobetNodeGRPCLIB(NobetNodeBase):
         self._channel = Channel(self._address, self._port, ssl=ctx)
         self._stub = NobetServiceStub(self._channel)
         self._monitor_task = asyncio.create_task(self._monitor_channel())
-        self._streaming_task = None
 
-        self._updates_queue = asyncio.Queue(1)
+        # (unban, users, duration, future) waiting to be delivered, kept
+        # while the node is unreachable and replayed once it's back
+        self._outbox: deque[tuple[bool, list[User], int | None, asyncio.Future]] = deque()
+        self._outbox_ready = asyncio.Event()
+        self._connected = asyncio.Event()
+        self._request_ids = itertools.count(1)
+        self._streaming_task = asyncio.create_task(self._deliver())
+
         self.synced = False
+        # None until the node answered a batch call / opened the ban stream,
+        # older nodes don't have them
+        self.batch_supported: bool | None = None
+        self.stream_supported: bool | None = None
         self.usage_coefficient = usage_coefficient
         atexit.register(self._channel.close)
 
@@ -75,17 +100,186 @@ class NobetNodeGRPCLIB(NobetNodeBase):
 
         return response
 
+    async def _batch(self, method, users: list[PB2_User]):
+        """Sends users in one batch call, None if the node doesn't support it"""
+        if self.batch_supported is False:
+            return None
+        try:
+            response = await method(PB2_Users(users=users))
+        except GRPCError as error:
+            if not _unimplemented(error):
+                raise
+            self.batch_supported = False
+            logger.info(
+                "node %i doesn't support batch calls, using unary calls", self.id)
+            return None
+        self.batch_supported = True
+        results = list(response.results)
+        logger.debug("node %i: %i of %i succeeded", self.id,
+                     sum(result.success for result in results), len(results))
+        return results
+
+    def _pb2_users(self, users: list[User], unban: bool, duration=None) -> list[PB2_User]:
+        if unban:
+            return [PB2_User(ip=user.ip) for user in users]
+        ban_duration = duration and int(duration) or int(BAN_INTERVAL)
+        return [PB2_User(ip=user.ip, banDuration=ban_duration) for user in users]
+
+    async def _send_direct(self, unban: bool, users: list[User], duration=None):
+        method = self._stub.UnBanUsers if unban else self._stub.BanUsers
+        results = await self._batch(method, self._pb2_users(users, unban, duration))
+        if results is None:
+            if unban:
+                results = await super().UnBanUsers(users)
+            else:
+                results = await super().BanUsers(users, duration)
+        return results
+
+    def _enqueue(self, unban: bool, users: list[User], duration=None) -> asyncio.Future:
+        if len(self._outbox) >= NODE_OUTBOX_SIZE:
+            *_, dropped = self._outbox.popleft()
+            if not dropped.done():
+                dropped.set_exception(RuntimeError("outbox is full"))
+            logger.warning("node %i outbox is full, dropped the oldest request", self.id)
+        future = asyncio.get_running_loop().create_future()
+        self._outbox.append((unban, users, duration, future))
+        self._outbox_ready.set()
+        return future
+
+    async def _submit(self, unban: bool, users: list[User], duration=None, on_delivered=None):
+        future = self._enqueue(unban, users, duration)
+        if not self._connected.is_set():
+            # delivered once the node is back, callers don't wait for that
+            def delivered(future: asyncio.Future):
+                dropped = future.cancelled() or future.exception() is not None
+                if on_delivered is not None:
+                    on_delivered(None if dropped else future.result())
+            future.add_done_callback(delivered)
+            return [Result(success=False, message=QUEUED) for _ in users]
+        # shielded, a caller giving up doesn't take the ban out of the outbox
+        return await asyncio.shield(future)
+
+    async def BanUsers(self, users: list[User], duration=None, on_delivered=None):
+        if not users:
+            return []
+        return await self._submit(False, users, duration, on_delivered)
+
+    async def UnBanUsers(self, users: list[User], on_delivered=None):
+        if not users:
+            return []
+        return await self._submit(True, users, on_delivered=on_delivered)
+
+    async def _deliver(self):
+        """Drains the outbox while the node is connected, over the Bans
+        stream or, for nodes without it, with batch (or unary) calls"""
+        while True:
+            await self._connected.wait()
+            if not self._outbox:
+                self._outbox_ready.clear()
+                await self._outbox_ready.wait()
+                continue
+            try:
+                if self.stream_supported is not False:
+                    await self._stream()
+                else:
+                    await self._send_next()
+            except asyncio.CancelledError:
+                raise
+            except GRPCError as error:
+                if self.stream_supported is None and _unimplemented(error):
+                    self.stream_supported = False
+                    logger.info("node %i doesn't support the ban stream", self.id)
+                    continue
+                logger.error("node %i: delivering bans failed: %s", self.id, error)
+                await asyncio.sleep(1)
+            except Exception as error:
+                logger.error("node %i: delivering bans failed: %s", self.id, error)
+                await asyncio.sleep(1)
+
+    async def _send_next(self):
+        """Sends the oldest requests in one call, consecutive requests of
+        the same kind are merged"""
+        entries = [self._outbox.popleft()]
+        unban, _, duration, _ = entries[0]
+        while (self._outbox and len(entries) < 100
+               and self._outbox[0][0] == unban and self._outbox[0][2] == duration):
+            entries.append(self._outbox.popleft())
+        try:
+            results = await self._send_direct(
+                unban, [user for entry in entries for user in entry[1]], duration)
+        except BaseException:
+            self._outbox.extendleft(reversed(entries))
+            raise
+        for _, users, _, future in entries:
+            if not future.done():
+                future.set_result(results[:len(users)])
+            results = results[len(users):]
+
+    async def _stream(self):
+        in_flight: dict[int, tuple[bool, list[User], int | None, asyncio.Future]] = {}
+        sent_at: dict[int, float] = {}
+        loop = asyncio.get_running_loop()
+        async with self._stub.Bans.open() as stream:
+            await stream.send_request()
+            receiver = asyncio.create_task(self._receive(stream, in_flight))
+            # its error, if any, is raised below or was already handled
+            receiver.add_done_callback(lambda task: task.cancelled() or task.exception())
+            try:
+                while not receiver.done():
+                    if not self._connected.is_set():
+                        raise ConnectionError("node disconnected")
+                    # a node that stopped answering gets a new stream
+                    oldest = next((sent_at[request_id] for request_id in in_flight), None)
+                    if oldest is not None and loop.time() - oldest > _ACK_TIMEOUT:
+                        raise TimeoutError("no answer on the ban stream")
+                    if not self._outbox:
+                        self._outbox_ready.clear()
+                        ready = asyncio.create_task(self._outbox_ready.wait())
+                        await asyncio.wait({receiver, ready}, timeout=1,
+                                           return_when=asyncio.FIRST_COMPLETED)
+                        ready.cancel()
+                        continue
+                    request_id = next(self._request_ids)
+                    in_flight[request_id] = entry = self._outbox.popleft()
+                    sent_at[request_id] = loop.time()
+                    unban, users, duration, _ = entry
+                    await stream.send_message(BanRequest(
+                        id=request_id, unban=unban,
+                        users=self._pb2_users(users, unban, duration)))
+                receiver.result()
+            finally:
+                receiver.cancel()
+                # unanswered requests go back to the front, in order
+                self._outbox.extendleft(reversed(in_flight.values()))
+
+    async def _receive(self, stream, in_flight: dict):
+        async for response in stream:
+            self.stream_supported = True
+            entry = in_flight.pop(response.id, None)
+            if entry is not None and not entry[3].done():
+                entry[3].set_result(list(response.results))
+
+    async def stop(self):
+        self._monitor_task.cancel()
+        self._streaming_task.cancel()
+        for *_, future in self._outbox:
+            if not future.done():
+                future.set_exception(RuntimeError(f"node {self.id} removed"))
+        self._outbox.clear()
+        self._channel.close()
+
     async def _monitor_channel(self):
         while state := self._channel._state:
             logger.debug("node %i channel state: %s", self.id, state.value)
             try:
                 await asyncio.wait_for(self._channel.__connect__(), timeout=2)
             except Exception:
-                node_db.update(DbNode.id == self.id, {
-                               "status": NodeStatus.unhealthy})
+                await maybe_await(node_db.update(DbNode.id == self.id, {
+                               "status": NodeStatus.unhealthy}))
                 logger.debug("timeout for node, id: %i", self.id)
                 await send_notification(f"timeout for node {self.name}, id: {self.id}")
                 self.synced = False
+                self._connected.clear()
             else:
                 if not self.synced:
                     try:
@@ -94,8 +288,12 @@ class NobetNodeGRPCLIB(NobetNodeBase):
                         pass
                     else:
                         self.synced = True
-                        node_db.update(DbNode.id == self.id, {
-                            "status": NodeStatus.healthy})
+                        # the node may have been upgraded while it was away
+                        self.batch_supported = None
+                        self.stream_supported = None
+                        self._connected.set()
+                        await maybe_await(node_db.update(DbNode.id == self.id, {
+                            "status": NodeStatus.healthy}))
                         logger.info("Connected to node %i", self.id)
                         await send_notification(f"Connected to node {self.name}")
             await asyncio.sleep(10)
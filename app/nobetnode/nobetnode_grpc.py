@@ -22,6 +22,18 @@ class NobetServiceBase(abc.ABC):
     async def UnBanUser(self, stream: 'grpclib.server.Stream[app.nobetnode.nobetnode_pb2.User, app.nobetnode.nobetnode_pb2.Result]') -> None:
         pass
 
+    @abc.abstractmethod
+    async def BanUsers(self, stream: 'grpclib.server.Stream[app.nobetnode.nobetnode_pb2.Users, app.nobetnode.nobetnode_pb2.Results]') -> None:
+        pass
+
+    @abc.abstractmethod
+    async def UnBanUsers(self, stream: 'grpclib.server.Stream[app.nobetnode.nobetnode_pb2.Users, app.nobetnode.nobetnode_pb2.Results]') -> None:
+        pass
+
+    @abc.abstractmethod
+    async def Bans(self, stream: 'grpclib.server.Stream[app.nobetnode.nobetnode_pb2.BanRequest, app.nobetnode.nobetnode_pb2.BanResponse]') -> None:
+        pass
+
     def __mapping__(self) -> typing.Dict[str, grpclib.const.Handler]:
         return {
             '/nobetnode.NobetService/BanUser': grpclib.const.Handler(
@@ -36,6 +48,24 @@ class NobetServiceBase(abc.ABC):
                 app.nobetnode.nobetnode_pb2.User,
                 app.nobetnode.nobetnode_pb2.Result,
             ),
+            '/nobetnode.NobetService/BanUsers': grpclib.const.Handler(
+                self.BanUsers,
+                grpclib.const.Cardinality.UNARY_UNARY,
+                app.nobetnode.nobetnode_pb2.Users,
+                app.nobetnode.nobetnode_pb2.Results,
+            ),
+            '/nobetnode.NobetService/UnBanUsers': grpclib.const.Handler(
+                self.UnBanUsers,
+                grpclib.const.Cardinality.UNARY_UNARY,
+                app.nobetnode.nobetnode_pb2.Users,
+                app.nobetnode.nobetnode_pb2.Results,
+            ),
+            '/nobetnode.NobetService/Bans': grpclib.const.Handler(
+                self.Bans,
+                grpclib.const.Cardinality.STREAM_STREAM,
+                app.nobetnode.nobetnode_pb2.BanRequest,
+                app.nobetnode.nobetnode_pb2.BanResponse,
+            ),
         }
 
 
@@ -54,3 +84,21 @@ class NobetServiceStub:
             app.nobetnode.nobetnode_pb2.User,
             app.nobetnode.nobetnode_pb2.Result,
         )
+        self.BanUsers = grpclib.client.UnaryUnaryMethod(
+            channel,
+            '/nobetnode.NobetService/BanUsers',
+            app.nobetnode.nobetnode_pb2.Users,
+            app.nobetnode.nobetnode_pb2.Results,
+        )
+        self.UnBanUsers = grpclib.client.UnaryUnaryMethod(
+            channel,
+            '/nobetnode.NobetService/UnBanUsers',
+            app.nobetnode.nobetnode_pb2.Users,
+            app.nobetnode.nobetnode_pb2.Results,
+        )
+        self.Bans = grpclib.client.StreamStreamMethod(
+            channel,
+            '/nobetnode.NobetService/Bans',
+            app.nobetnode.nobetnode_pb2.BanRequest,
+            app.nobetnode.nobetnode_pb2.BanResponse,
+        )
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1d\x61pp/nobetnode/nobetnode.proto\x12\tnobetnode\"\'\n\x04User\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x13\n\x0b\x62\x61nDuration\x18\x02 \x01(\r\"*\n\x06Result\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t2n\n\x0cNobetService\x12-\n\x07\x42\x61nUser\x12\x0f.nobetnode.User\x1a\x11.nobetnode.Result\x12/\n\tUnBanUser\x12\x0f.nobetnode.User\x1a\x11.nobetnode.Resultb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1d\x61pp/nobetnode/nobetnode.proto\x12\tnobetnode\"\'\n\x04User\x12\n\n\x02ip\x18\x01 \x01(\t\x12\x13\n\x0b\x62\x61nDuration\x18\x02 \x01(\r\"\'\n\x05Users\x12\x1e\n\x05users\x18\x01 \x03(\x0b\x32\x0f.nobetnode.User\"*\n\x06Result\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"-\n\x07Results\x12\"\n\x07results\x18\x01 \x03(\x0b\x32\x11.nobetnode.Result\"G\n\nBanRequest\x12\n\n\x02id\x18\x01 \x01(\x04\x12\r\n\x05unban\x18\x02 \x01(\x08\x12\x1e\n\x05users\x18\x03 \x03(\x0b\x32\x0f.nobetnode.User\"=\n\x0b\x42\x61nResponse\x12\n\n\x02id\x18\x01 \x01(\x04\x12\"\n\x07results\x18\x02 \x03(\x0b\x32\x11.nobetnode.Result2\x8f\x02\n\x0cNobetService\x12-\n\x07\x42\x61nUser\x12\x0f.nobetnode.User\x1a\x11.nobetnode.Result\x12/\n\tUnBanUser\x12\x0f.nobetnode.User\x1a\x11.nobetnode.Result\x12\x30\n\x08\x42\x61nUsers\x12\x10.nobetnode.Users\x1a\x12.nobetnode.Results\x12\x32\n\nUnBanUsers\x12\x10.nobetnode.Users\x1a\x12.nobetnode.Results\x12\x39\n\x04\x42\x61ns\x12\x15.nobetnode.BanRequest\x1a\x16.nobetnode.BanResponse(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,8 +33,16 @@ if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_USER']._serialized_start=44
   _globals['_USER']._serialized_end=83
-  _globals['_RESULT']._serialized_start=85
-  _globals['_RESULT']._serialized_end=127
-  _globals['_NOBETSERVICE']._serialized_start=129
-  _globals['_NOBETSERVICE']._serialized_end=239
+  _globals['_USERS']._serialized_start=85
+  _globals['_USERS']._serialized_end=124
+  _globals['_RESULT']._serialized_start=126
+  _globals['_RESULT']._serialized_end=168
+  _globals['_RESULTS']._serialized_start=170
+  _globals['_RESULTS']._serialized_end=215
+  _globals['_BANREQUEST']._serialized_start=217
+  _globals['_BANREQUEST']._serialized_end=288
+  _globals['_BANRESPONSE']._serialized_start=290
+  _globals['_BANRESPONSE']._serialized_end=351
+  _globals['_NOBETSERVICE']._serialized_start=354
+  _globals['_NOBETSERVICE']._serialized_end=625
 # @@protoc_insertion_point(module_scope)
@@ -1,11 +1,17 @@
 import asyncio
+import logging
 from collections import defaultdict
 from typing import TYPE_CHECKING
 
 from app import nobetnode
+from app.config import NODE_REQUEST_CONCURRENCY, NODE_REQUEST_TIMEOUT
 from .grpclib import NobetNodeGRPCLIB
 from ..models.user import User
 
+logger = logging.getLogger(__name__)
+
+_requests = asyncio.Semaphore(NODE_REQUEST_CONCURRENCY)
+
 
 async def remove_node(node_id: int):
     if node_id in nobetnode.nodes:
@@ -24,4 +30,49 @@ async def add_node(db_node, certificate):
     nobetnode.nodes[db_node.id] = node
 
 
-__all__ = ["update_user", "add_node", "remove_node"]
\ No newline at end of file
+async def _send(node_id: int, node, method: str, users: list[User], *args,
+                on_delivered=None) -> dict:
+    callback = on_delivered and (lambda results: on_delivered(node_id, results))
+    async with _requests:
+        try:
+            results = await asyncio.wait_for(
+                getattr(node, method)(users, *args, on_delivered=callback),
+                NODE_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"{method} timed out on node {node_id}")
+            return {"node": node.name, "success": False, "error": "timeout"}
+        except Exception as err:
+            logger.error(f"{method} failed on node {node_id}: {err}")
+            return {"node": node.name, "success": False, "error": str(err)}
+
+    results = [{"ip": user.ip, "success": result.success, "message": result.message}
+               for user, result in zip(users, results)]
+    return {"node": node.name,
+            "success": all(result["success"] for result in results),
+            "results": results}
+
+
+async def _fan_out(method: str, node_ids, users: list[User], *args,
+                   on_delivered=None) -> dict[int, dict]:
+    """Sends users to every node (or the given node ids) at once, at most
+    NODE_REQUEST_CONCURRENCY requests are in flight and each node gets
+    NODE_REQUEST_TIMEOUT seconds. Returns the outcome per node id, nodes
+    that queued the request call on_delivered(node id, results) later"""
+    targets = [(node_id, node) for node_id, node in list(nobetnode.nodes.items())
+               if node_ids is None or node_id in node_ids]
+    outcomes = await asyncio.gather(
+        *(_send(node_id, node, method, users, *args, on_delivered=on_delivered)
+          for node_id, node in targets))
+    return {node_id: outcome for (node_id, _), outcome in zip(targets, outcomes)}
+
+
+async def ban_users(users: list[User], duration=None, node_ids=None,
+                    on_delivered=None) -> dict[int, dict]:
+    return await _fan_out("BanUsers", node_ids, users, duration, on_delivered=on_delivered)
+
+
+async def unban_users(users: list[User], node_ids=None, on_delivered=None) -> dict[int, dict]:
+    return await _fan_out("UnBanUsers", node_ids, users, on_delivered=on_delivered)
+
+
+__all__ = ["update_user", "add_node", "remove_node", "ban_users", "unban_users"]
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.routes import auth, node
+from app.routes import auth, ban, node
 
 from . import user
 
@@ -9,5 +9,6 @@ api_router = APIRouter()
 api_router.include_router(user.router, prefix="/api")
 api_router.include_router(auth.router, prefix="/api")
 api_router.include_router(node.router, prefix="/api")
+api_router.include_router(ban.router, prefix="/api")
 
 __all__ = ["api_router"]
\ No newline at end of file
@@ -0,0 +1,20 @@
+import logging
+
+from fastapi import APIRouter
+
+from app.deps import SudoAdminDep
+from app.service.ban_registry import ban_registry
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/bans", tags=["Ban"])
+
+
+@router.get("")
+async def get(admin: SudoAdminDep):
+    return {"success": True, "data": ban_registry.get_all(), "suppressed": ban_registry.suppressed}
+
+
+@router.get("/{ip}")
+async def get_by_ip(ip: str, admin: SudoAdminDep):
+    ban = ban_registry.get(ip)
+    return {"success": ban != None, "data": ban}
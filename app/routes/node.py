@@ -9,6 +9,7 @@ from app.deps import SudoAdminDep
 from app.models.node import AddNode, Node
 from app.models.tls import TLS
 from app.nobetnode import operations
+from app.utils.awaitable import maybe_await
 from app.utils.tls import get_tls_certificate
 
 
@@ -20,7 +21,7 @@ router = APIRouter(prefix="/nodes", tags=["Node"])
 
 @router.get("")
 async def get(admin: SudoAdminDep):
-    return {"success": True, "data": node_db.get_all(True)}
+    return {"success": True, "data": await maybe_await(node_db.get_all(True))}
 
 
 @router.get("/settings")
@@ -32,13 +33,13 @@ async def update_node(admin: SudoAdminDep):
 
 @router.post("")
 async def add_node(new_node: AddNode, admin: SudoAdminDep):
-    node = node_db.add({
+    node = await maybe_await(node_db.add({
         "name": new_node.name,
         "address": new_node.address,
         "port": new_node.port,
         "status": new_node.status,
         "message": new_node.message
-    })
+    }))
 
     certificate = get_tls_certificate()
 
@@ -51,25 +52,25 @@ async def add_node(new_node: AddNode, admin: SudoAdminDep):
 
 @router.get("/{id}")
 async def get_by_id(id: int, admin: SudoAdminDep):
-    return {"success": True, "data": node_db.get(models.Node.id == id)}
+    return {"success": True, "data": await maybe_await(node_db.get(models.Node.id == id))}
 
 
 @router.delete("/{id}")
 async def delete(id: int, admin: SudoAdminDep):
-    node_db.delete(models.Node.id == id)
+    await maybe_await(node_db.delete(models.Node.id == id))
 
     return {"success": True}
 
 
 @router.put("/{id}")
 async def update_node(id: int, new_node: AddNode, admin: SudoAdminDep):
-    node_db.update(models.Node.id == id, {
+    await maybe_await(node_db.update(models.Node.id == id, {
         "name": new_node.name,
         "address": new_node.address,
         "port": new_node.port,
         "status": new_node.status,
         "message": new_node.message
-    })
+    }))
 
     logger.info("Node `%s` updated with `%s` address",
                 new_node.name, new_node.address)
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from app import nobetnode
+from app.config import BAN_INTERVAL
+from app.db.base import SessionLocal
+from app.db.models import Ban as DbBan
+from app.models.ban import Ban
+from app.models.user import User
+from app.nobetnode import operations
+from app.nobetnode.base import QUEUED
+
+logger = logging.getLogger(__name__)
+
+
+class BanRegistry:
+    """Active bans by ip, mirrored to the bans table so they survive a
+    restart.
+
+    ban() doesn't send an ip again to nodes it's already banned on, an ip
+    banned on every node is skipped altogether. Nodes which are down
+    queue the ban, they're kept as pending and moved to the ban's nodes
+    once it's delivered, so they aren't sent the same ban again meanwhile.
+    Entries expire with the ban duration, expiry times are kept in a heap
+    that is swept every second."""
+
+    def __init__(self):
+        self.bans: dict[str, Ban] = {}
+        self._expiry: list[tuple[datetime, str]] = []
+        self._saving: set[asyncio.Task] = set()
+        self.suppressed = 0
+
+    def load(self):
+        with SessionLocal() as session:
+            rows = session.query(DbBan).filter(
+                DbBan.expires_at > datetime.now()).all()
+        for row in rows:
+            self._remember(Ban(ip=row.ip, name=row.name,
+                               nodes=row.nodes, expires_at=row.expires_at))
+        logger.info(f"loaded {len(rows)} active bans")
+
+    def _remember(self, ban: Ban):
+        self.bans[ban.ip] = ban
+        heapq.heappush(self._expiry, (ban.expires_at, ban.ip))
+
+    def get(self, ip: str) -> Ban | None:
+        ban = self.bans.get(ip)
+        if ban is None or ban.expires_at <= datetime.now():
+            return None
+        return ban
+
+    def get_all(self) -> list[Ban]:
+        now = datetime.now()
+        return [ban for ban in self.bans.values() if ban.expires_at > now]
+
+    def _missing_nodes(self, ip: str) -> set[int]:
+        ban = self.get(ip)
+        if ban is None:
+            return set(nobetnode.nodes)
+        return set(nobetnode.nodes) - set(ban.nodes) - set(ban.pending)
+
+    def covers(self, ip: str) -> bool:
+        """True when the ip is banned on every node"""
+        return bool(nobetnode.nodes) and not self._missing_nodes(ip)
+
+    async def ban(self, users: list[User], duration=None, force: bool = False) -> dict[int, dict]:
+        """Bans users on the nodes they aren't banned on yet, or on every
+        node with `force`. Returns the outcome per node id. A duration
+        that isn't a number of seconds raises ValueError before anything
+        is sent"""
+        duration = int(duration or BAN_INTERVAL)
+        groups: dict[frozenset[int], list[User]] = {}
+        seen = set()
+        for user in users:
+            if user.ip in seen:
+                continue
+            seen.add(user.ip)
+            missing = set(nobetnode.nodes) if force else self._missing_nodes(user.ip)
+            if not missing:
+                self.suppressed += 1
+                continue
+            groups.setdefault(frozenset(missing), []).append(user)
+
+        outcomes = await asyncio.gather(*(
+            operations.ban_users(
+                group, duration, node_ids,
+                on_delivered=lambda node_id, results, group=group: self._delivered(
+                    node_id, group, results))
+            for node_ids, group in groups.items()))
+
+        expires_at = datetime.now() + timedelta(seconds=duration)
+        results: dict[int, dict] = {}
+        changed = []
+        for group, outcome in zip(groups.values(), outcomes):
+            banned_on: dict[str, set[int]] = {}
+            queued_on: dict[str, set[int]] = {}
+            for node_id, result in outcome.items():
+                for item in result.get("results", []):
+                    if item["success"]:
+                        banned_on.setdefault(item["ip"], set()).add(node_id)
+                    elif item["message"] == QUEUED:
+                        queued_on.setdefault(item["ip"], set()).add(node_id)
+                _merge(results, node_id, result)
+
+            for user in group:
+                if user.ip not in banned_on and user.ip not in queued_on:
+                    continue
+                previous = self.get(user.ip)
+                nodes = banned_on.get(user.ip, set()) | set(previous.nodes if previous else [])
+                pending = queued_on.get(user.ip, set()) | set(previous.pending if previous else [])
+                ban = Ban(
+                    ip=user.ip, name=user.name, nodes=sorted(nodes),
+                    pending=sorted(pending - nodes),
+                    expires_at=max(expires_at, previous.expires_at) if previous else expires_at)
+                self._remember(ban)
+                changed.append(ban)
+
+        if changed:
+            await asyncio.to_thread(self._save, changed)
+        return results
+
+    def _delivered(self, node_id: int, users: list[User], results: list | None):
+        """A ban queued for a node was sent (results) or dropped (None)"""
+        changed = []
+        for index, user in enumerate(users):
+            ban = self.bans.get(user.ip)
+            if ban is None or node_id not in ban.pending:
+                continue
+            nodes = set(ban.nodes)
+            if results is not None and index < len(results) and results[index].success:
+                nodes.add(node_id)
+            self.bans[user.ip] = ban = ban.model_copy(update={
+                "nodes": sorted(nodes),
+                "pending": [pending for pending in ban.pending if pending != node_id]})
+            changed.append(ban)
+        if not changed:
+            return
+        task = asyncio.ensure_future(asyncio.to_thread(self._save, changed))
+        self._saving.add(task)
+        task.add_done_callback(self._saved)
+
+    def _saved(self, task: asyncio.Task):
+        self._saving.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"failed to save delivered bans: {task.exception()}")
+
+    async def unban(self, users: list[User]) -> dict[int, dict]:
+        results = await operations.unban_users(users)
+        ips = [user.ip for user in users]
+        for ip in ips:
+            self.bans.pop(ip, None)
+        await asyncio.to_thread(self._delete, ips)
+        return results
+
+    def expire(self, now: datetime | None = None) -> int:
+        now = now or datetime.now()
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, ip = heapq.heappop(self._expiry)
+            ban = self.bans.get(ip)
+            # a renewed ban has a later entry of its own
+            if ban is not None and ban.expires_at <= now:
+                del self.bans[ip]
+                expired += 1
+        return expired
+
+    async def run_expirer(self, interval: int = 1):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.expire():
+                    await asyncio.to_thread(self._delete_expired)
+            except Exception as error:
+                logger.error(f"failed to expire bans: {error}")
+
+    def _save(self, bans: list[Ban]):
+        with SessionLocal() as session:
+            rows = {row.ip: row for row in session.query(DbBan).filter(
+                DbBan.ip.in_([ban.ip for ban in bans]))}
+            for ban in bans:
+                row = rows.get(ban.ip)
+                if row is None:
+                    session.add(DbBan(**ban.model_dump(exclude={"pending"})))
+                else:
+                    row.name, row.nodes, row.expires_at = ban.name, ban.nodes, ban.expires_at
+            session.commit()
+
+    def _delete(self, ips: list[str]):
+        with SessionLocal() as session:
+            session.query(DbBan).filter(DbBan.ip.in_(ips)).delete()
+            session.commit()
+
+    def _delete_expired(self):
+        with SessionLocal() as session:
+            session.query(DbBan).filter(
+                DbBan.expires_at <= datetime.now()).delete()
+            session.commit()
+
+
+def _merge(results: dict[int, dict], node_id: int, result: dict):
+    """Adds a node's outcome for one group of users to the overall ones"""
+    merged = results.setdefault(node_id, {"node": result["node"], "success": True})
+    merged["success"] = merged["success"] and result["success"]
+    if "error" in result:
+        merged["error"] = result["error"]
+    if "results" in result:
+        merged.setdefault("results", []).extend(result["results"])
+
+
+ban_registry = BanRegistry()
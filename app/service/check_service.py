@@ -1,16 +1,22 @@
 import asyncio
 import inspect
 import logging
+from collections import Counter
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from app.config import ACCEPTED, BAN_LAST_USER, DB_REQUEST_LIMIT_ON_CHECKING, DEFAULT_LIMIT, IUL, STL
-from app.db.models import ExceptedIP, UserLimit
-from app.models.user import User
-from app.nobetnode import nodes
+from app.config import (ACCEPTED, BAN_LAST_USER, CHECK_GATE_INTERVAL, DB_REQUEST_LIMIT_ON_CHECKING,
+                        DEFAULT_LIMIT, IUL, REPEAT_DECAY, STL, STORAGE_WINDOW)
+from app.db.models import UserLimit
+from app.models.user import ConnectionEvent
+from app.service.ban_registry import ban_registry
 from app.db import excepted_ips
 from app.notification.telegram import send_notification_with_reply_markup
 from app.storage.base import BaseStorage
+from app.storage.redis import RedisStorage
+from app.storage.sharded import ShardedStorage
 from app.db.db_base import DBBase
+from app.utils.counter import RepeatCounter
+from app.utils.gate import ConnectionGate
 
 logger = logging.getLogger(__name__)
 
@@ -20,76 +26,142 @@ class CheckService:
     def __init__(self, storage: BaseStorage, specify_limit_db: DBBase):
         self._storage = storage
         self._specify_limit_db = specify_limit_db
-        self._in_process_ips = []
-        self.repeated_out_of_limits = []
+        self._in_process_ips = set()
+        self.repeated_out_of_limits = RepeatCounter(REPEAT_DECAY)
         self.sem = asyncio.Semaphore(DB_REQUEST_LIMIT_ON_CHECKING)
+        # other instances may put a user out of limit, this one wouldn't know
+        gate_interval = 0 if isinstance(storage, RedisStorage) else CHECK_GATE_INTERVAL
+        self.gate = ConnectionGate(gate_interval, STORAGE_WINDOW)
 
-    async def check(self, user: User):
+    async def check(self, user: ConnectionEvent):
+        await self.check_many([user])
 
+    async def _limit(self, name: str) -> int:
         async with self.sem:
-            specify_user = self._specify_limit_db.get(
-                UserLimit.name == user.name)
+            specify_user = self._specify_limit_db.get(UserLimit.name == name)
 
             if inspect.isawaitable(specify_user):
                 specify_user = await specify_user
 
-        user_limit = specify_user.limit if specify_user is not None else DEFAULT_LIMIT
+        return specify_user.limit if specify_user is not None else DEFAULT_LIMIT
+
+    async def check_many(self, users: list[ConnectionEvent], hits: list[int] | None = None):
+        """Checks a batch of users, e.g. the distinct (name, ip) pairs of a
+        log frame, `hits` is how many log lines each one had. Limits are
+        looked up once per name and the users out of limit are banned in
+        one call. Repeated ips of users within their limit are skipped by
+        the gate"""
+        batch = [(user, hits[index] if hits else 1) for index, user in enumerate(users)
+                 if self.gate.allow(user.name, user.ip)]
+        if not batch:
+            return
 
-        if user_limit == 0 or excepted_ips.get(ExceptedIP.ip == user.ip):
+        names = list({user.name: None for user, _ in batch})
+        limits = dict(zip(names, await asyncio.gather(*map(self._limit, names))))
+
+        checked = []
+        for user, user_hits in batch:
+            user_limit = limits[user.name]
+            if user.ip in self._in_process_ips:
+                continue
+
+            if user_limit == 0 or await excepted_ips.is_excepted(user.ip):
+                self.gate.remember(user.name, user.ip)
+                continue
+            checked.append((user, user_limit, user_hits))
+
+        # every ip of the batch is known before deciding, the lines of an ip
+        # seen before its user went out of limit in this frame count too
+        ips = Counter(user.name for user, _, _ in checked)
+        added = [user for user, _, _ in checked if ips[user.name] > 1]
+        if added:
+            added = self._storage.add_users(added)
+            if inspect.isawaitable(added):
+                await added
+
+        decisions = []
+        for user, user_limit, user_hits in checked:
+            decision = self.decide(user, user_limit, user_hits)
+            if inspect.isawaitable(decision):
+                decision = await decision
+            if decision is None:
+                self.gate.remember(user.name, user.ip)
+                continue
+            # every line of a user out of limit counts
+            self.gate.forget(user.name)
+            if decision is False:
+                continue
+
+            user_to_ban, userByEmail = decision
+            if ban_registry.covers(user_to_ban.ip):
+                logger.debug(f"{user_to_ban.ip} is already banned on every node")
+                continue
+            decisions.append(decision)
+
+        if not decisions:
             return
 
+        in_process = {userByEmail.ip for _, userByEmail in decisions}
+        self._in_process_ips |= in_process
+        try:
+            await self.ban_users([user_to_ban for user_to_ban, _ in decisions])
+        finally:
+            self._in_process_ips -= in_process
+
+        for _, userByEmail in decisions:
+            log_message = 'banned user ' + userByEmail.name+" with ip " + userByEmail.ip + \
+                '\nnode: '+userByEmail.node + "\ninbound: "+userByEmail.inbound
+            if ACCEPTED:
+                log_message += '\naccepted: '+userByEmail.accepted
+            logger.info(log_message)
+            await send_notification_with_reply_markup(log_message, InlineKeyboardMarkup([[InlineKeyboardButton("Unban IP", callback_data=userByEmail.ip)]]))
+
+    def decide(self, user: ConnectionEvent, user_limit: int,
+               hits: int = 1) -> tuple[ConnectionEvent, ConnectionEvent] | bool | None:
+        """Tracks the user's ip and returns (user to ban, first user) once
+        the user is out of limit for long enough, False while it's out of
+        limit but not for long enough and None while it's within its limit.
+        With ShardedStorage this runs in the shard owning the user, with
+        RedisStorage on the shared state, both return a coroutine"""
+        if isinstance(self._storage, (ShardedStorage, RedisStorage)):
+            return self._storage.decide(user, user_limit, hits)
+
         self._storage.add_user(user)
 
         users = self._storage.get_users(user.name)
 
-        if len(users) > user_limit and user.ip not in self._in_process_ips:
-            userByEmail = self._storage.get_user(user.name)
-            userLast = self._storage.get_last_user(user.name)
-
-            if userByEmail is None:
-                return
+        if len(users) <= user_limit:
+            return None
 
-            self.repeated_out_of_limits.append(user)
+        userByEmail = self._storage.get_user(user.name)
+        userLast = self._storage.get_last_user(user.name)
 
-            rl_len = len(list(filter(lambda x: x.name == userByEmail.name and x.ip ==
-                                     userByEmail.ip, self.repeated_out_of_limits)))
-            rl_last_len = len(list(filter(
-                lambda x: x.name == userLast.name and x.ip == userLast.ip, self.repeated_out_of_limits)))
+        if userByEmail is None:
+            return None
 
-            logger.debug(f"rl length: {rl_len}")
-            logger.debug(f"rl last length: {rl_last_len}")
+        self.repeated_out_of_limits.increment(user.name, user.ip, hits)
 
-            if rl_len < STL or rl_last_len < STL:
-                if abs(rl_len-rl_last_len) > IUL:
-                    self.repeated_out_of_limits = [
-                        r for r in self.repeated_out_of_limits if r.name != userByEmail.name and r.ip != userByEmail.ip]
-                    self.repeated_out_of_limits = [
-                        r for r in self.repeated_out_of_limits if r.name != user.name and r.ip != user.ip]
-                    self._storage.delete_user(userByEmail.name, userByEmail.ip)
-                return
-            self.repeated_out_of_limits = [
-                r for r in self.repeated_out_of_limits if r.name != userByEmail.name and r.ip != userByEmail.ip]
-            self.repeated_out_of_limits = [
-                r for r in self.repeated_out_of_limits if r.name != user.name and r.ip != user.ip]
+        rl_len = self.repeated_out_of_limits.get(
+            userByEmail.name, userByEmail.ip)
+        rl_last_len = self.repeated_out_of_limits.get(
+            userLast.name, userLast.ip)
 
-            self._in_process_ips.append(userByEmail.ip)
+        logger.debug(f"rl length: {rl_len}")
+        logger.debug(f"rl last length: {rl_last_len}")
 
-            await self.ban_user(userLast if BAN_LAST_USER else userByEmail)
+        if rl_len < STL or rl_last_len < STL:
+            if abs(rl_len-rl_last_len) > IUL:
+                self.repeated_out_of_limits.reset(user.name)
+                self._storage.delete_user(userByEmail.name, userByEmail.ip)
+            return False
+        self.repeated_out_of_limits.reset(user.name)
 
-            self._in_process_ips.remove(userByEmail.ip)
+        self._storage.delete_user(userByEmail.name, userByEmail.ip)
 
-            self._storage.delete_user(userByEmail.name, userByEmail.ip)
+        return (userLast if BAN_LAST_USER else userByEmail), userByEmail
 
-            log_message = 'banned user ' + userByEmail.name+" with ip " + userByEmail.ip + \
-                '\nnode: '+userByEmail.node + "\ninbound: "+userByEmail.inbound
-            if ACCEPTED:
-                log_message += '\naccepted: '+userByEmail.accepted
-            logger.info(log_message)
-            await send_notification_with_reply_markup(log_message, InlineKeyboardMarkup([[InlineKeyboardButton("Unban IP", callback_data=userByEmail.ip)]]))
+    async def ban_user(self, user: ConnectionEvent):
+        await self.ban_users([user])
 
-    async def ban_user(self, user: User):
-        for node in nodes.keys():
-            try:
-                await nodes[node].BanUser(user)
-            except Exception as err:
-                logger.error('error: ', err)
+    async def ban_users(self, users: list[ConnectionEvent]):
+        await ban_registry.ban(users)
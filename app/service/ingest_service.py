@@ -0,0 +1,139 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+
+from app.config import INGEST_BATCH_SIZE, INGEST_OVERFLOW, INGEST_QUEUE_SIZE, INGEST_WORKERS, PARSER_PROCESSES
+from app.models.user import ConnectionEvent
+from app.service.check_service import CheckService
+from app.utils.parser import parse_logs_to_batch, row_to_event
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_old")
+
+_parser_pool: ProcessPoolExecutor | None = None
+
+
+def get_parser_pool() -> ProcessPoolExecutor | None:
+    global _parser_pool
+    if PARSER_PROCESSES and _parser_pool is None:
+        # forking would copy the running event loop, threads and sockets
+        _parser_pool = ProcessPoolExecutor(
+            PARSER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _parser_pool
+
+
+class IngestService:
+    """Bounded queue between the log streams and CheckService.
+
+    Producers put parsed connections or whole log frames, a frame is queued as
+    one batch of its distinct (user, ip) pairs and checked with one
+    CheckService.check_many call. A fixed pool of workers drains the
+    queue. When the queue is full the INGEST_OVERFLOW policy decides:
+    `block` waits for room (backpressure on the stream), `drop_new`
+    drops the incoming batch and `drop_old` drops the oldest queued one."""
+
+    def __init__(self, check_service: CheckService,
+                 queue_size: int = INGEST_QUEUE_SIZE,
+                 workers: int = INGEST_WORKERS,
+                 batch_size: int = INGEST_BATCH_SIZE,
+                 overflow: str = INGEST_OVERFLOW):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"INGEST_OVERFLOW is {overflow!r}, expected one of "
+                             + ", ".join(OVERFLOW_POLICIES))
+        self._check_service = check_service
+        # (users, how many log lines each user had)
+        self._queue: asyncio.Queue[tuple[list[ConnectionEvent], list[int]]] = asyncio.Queue(queue_size)
+        self._workers_count = workers
+        self._batch_size = batch_size
+        self._overflow = overflow
+        self._workers: list[asyncio.Task] = []
+        self._parsers: set[asyncio.Task] = set()
+        # frames handed to the parser processes but not queued yet
+        self._parsing = asyncio.Semaphore(max(PARSER_PROCESSES, 1) * 4)
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self._workers:
+            return
+        for i in range(self._workers_count):
+            self._workers.append(asyncio.create_task(
+                self._worker(), name=f"ingest-worker-{i}"))
+
+    async def stop(self):
+        for task in [*self._workers, *self._parsers]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._parsers, return_exceptions=True)
+        self._workers.clear()
+
+    async def put(self, user: ConnectionEvent):
+        await self.put_batch([user], [1])
+
+    async def put_batch(self, users: list[ConnectionEvent], hits: list[int]):
+        if not users:
+            return
+        self.start()
+        batch = (users, hits)
+
+        if self._overflow == "block":
+            await self._queue.put(batch)
+            return
+
+        if self._queue.full():
+            self._drop()
+            if self._overflow != "drop_old":
+                return
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+        self._queue.put_nowait(batch)
+
+    async def put_frame(self, logs: str, node: str):
+        """Parses a raw log frame and queues its users as one batch. With
+        PARSER_PROCESSES multi-line frames are parsed in the process pool,
+        the stream only waits when too many frames are already being parsed"""
+        pool = get_parser_pool()
+        if pool is None or '\n' not in logs:
+            rows, hits = parse_logs_to_batch(logs)
+            await self.put_batch([row_to_event(row, node) for row in rows], hits)
+            return
+
+        await self._parsing.acquire()
+        task = asyncio.create_task(self._put_parsed_frame(pool, logs, node))
+        self._parsers.add(task)
+        task.add_done_callback(self._parsers.discard)
+
+    async def _put_parsed_frame(self, pool: ProcessPoolExecutor, logs: str, node: str):
+        try:
+            rows, hits = await asyncio.get_running_loop().run_in_executor(
+                pool, parse_logs_to_batch, logs)
+            await self.put_batch([row_to_event(row, node) for row in rows], hits)
+        except Exception as error:
+            logger.exception(f"failed to parse log frame of {node}: {error}")
+        finally:
+            self._parsing.release()
+
+    def _drop(self):
+        self.dropped += 1
+        if self.dropped % 1000 == 1:
+            logger.warning(f"ingest queue is full ({self._queue.maxsize}), "
+                           + f"{self.dropped} batches dropped so far")
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            for users, hits in batch:
+                try:
+                    await self._check_service.check_many(users, hits)
+                except Exception as error:
+                    logger.exception(f"failed to check {len(users)} users: {error}")
+                finally:
+                    self._queue.task_done()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import random
+import ssl
+import time
+from ssl import SSLError
+from typing import Awaitable, Callable
+
+import httpx
+import websockets
+
+from app.config import (STREAM_BACKOFF_BASE, STREAM_BACKOFF_MAX, STREAM_BREAKER_COOLDOWN,
+                        STREAM_BREAKER_THRESHOLD, STREAM_NOTIFY_INTERVAL)
+from app.models.panel import Panel
+from app.notification.telegram import send_notification
+from app.service.ingest_service import IngestService
+from app.utils.panel.client import get_client
+from app.utils.panel.token import is_auth_error, tokens
+from app.utils.parser import parse_log_to_event
+
+logger = logging.getLogger(__name__)
+
+_ssl_context = ssl.create_default_context()
+_ssl_context.check_hostname = False
+_ssl_context.verify_mode = ssl.CERT_NONE
+
+
+class Notifications:
+    """At most one telegram notification per kind every `interval` seconds,
+    the ones in between are only logged and counted. Streams failing or
+    coming back together send one message instead of one per node"""
+
+    def __init__(self, interval: int = STREAM_NOTIFY_INTERVAL):
+        self.interval = interval
+        self._sent: dict[str, float] = {}
+        self._suppressed: dict[str, int] = {}
+
+    async def send(self, key: str, message: str):
+        now = time.monotonic()
+        if now - self._sent.get(key, -self.interval) < self.interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return
+        self._sent[key] = now
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        await send_notification(message)
+
+
+notifications = Notifications()
+
+
+class LogStream(ABC):
+    """A log stream of the panel (of a node or of the core), kept open.
+
+    Failed connections are retried after an exponentially growing delay
+    with jitter, so streams that failed together don't reconnect together.
+    After STREAM_BREAKER_THRESHOLD failures in a row the node is reported
+    down once (the circuit opens) and tried every STREAM_BREAKER_COOLDOWN
+    seconds until it answers again. Both schemes are tried until one
+    works, then it's remembered for the panel and only a TLS error moves
+    on to the other. Telegram notifications go through `notifications`,
+    so a panel restart doesn't flood the chat."""
+
+    def __init__(self, panel_data: Panel, get_token: Callable[[Panel], Awaitable[Panel]],
+                 ingest: IngestService, node_name: str, label: str, path: str):
+        self.panel_data = panel_data
+        self.path = path
+        self.get_token = get_token
+        self.ingest = ingest
+        self.node_name = node_name
+        self.label = label
+        self.failures = 0
+        self.down = False
+
+    @abstractmethod
+    def _url(self, scheme: str, token: str) -> str:
+        pass
+
+    @abstractmethod
+    async def _consume(self, scheme: str, token: str):
+        """Reads the stream until it's closed, calls _connected() once it's open"""
+        pass
+
+    def delay(self) -> float:
+        if self.failures >= STREAM_BREAKER_THRESHOLD:
+            delay = STREAM_BREAKER_COOLDOWN
+        else:
+            delay = min(STREAM_BACKOFF_MAX, STREAM_BACKOFF_BASE * 2 ** (self.failures - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _connected(self, scheme: str):
+        get_client(self.panel_data.domain).remember(scheme)
+        self.failures = 0
+        message = f"Establishing connection for {self.label}"
+        logger.info(message)
+        if self.down:
+            self.down = False
+            await notifications.send("back", f"{self.label} is back")
+        else:
+            await notifications.send("connected", message)
+
+    async def _failed(self, error: Exception):
+        self.failures += 1
+        message = f"Failed to connect to {self.label} [Error Message: {str(error) or type(error).__name__}]"
+        if self.failures == STREAM_BREAKER_THRESHOLD:
+            self.down = True
+            message += (f", {self.failures} attempts failed in a row, "
+                        + f"trying again every {STREAM_BREAKER_COOLDOWN} seconds")
+            logger.error(message)
+            await notifications.send("down", message)
+            return
+        logger.error(message)
+        if not self.down:
+            await notifications.send("failed", message)
+
+    async def run(self):
+        schemes = get_client(self.panel_data.domain).schemes()
+        while True:
+            token = None
+            try:
+                token = (await self.get_token(self.panel_data)).token
+                await self._consume(schemes[0], token)
+                error = ConnectionError("the stream was closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as stream_error:
+                error = stream_error
+                if token is not None and is_auth_error(error):
+                    tokens.invalidate(self.panel_data, token)
+                elif _tls_error(error) or get_client(self.panel_data.domain).scheme is None:
+                    # the other scheme is tried next, until one of them worked
+                    schemes = schemes[1:] + schemes[:1]
+            await self._failed(error)
+            await asyncio.sleep(self.delay())
+
+
+def _tls_error(error: BaseException | None) -> bool:
+    """httpx wraps the SSLError, websockets raises it as is"""
+    while error is not None:
+        if isinstance(error, SSLError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class WebSocketLogStream(LogStream):
+    """Log frames read from a panel websocket (marzban, rebecca, marzneshin)"""
+
+    def _url(self, scheme: str, token: str) -> str:
+        interval = random.choice(("0.9", "1.3", "1.5", "1.7"))
+        ws_scheme = "wss" if scheme == "https" else "ws"
+        return f"{ws_scheme}://{self.panel_data.domain}{self.path}?interval={interval}&token={token}"
+
+    async def _consume(self, scheme: str, token: str):
+        async with websockets.connect(
+            self._url(scheme, token),
+            ssl=_ssl_context if scheme == "https" else None,
+        ) as ws:
+            await self._connected(scheme)
+            while True:
+                logs = await ws.recv()
+                await self.ingest.put_frame(logs, self.node_name)
+
+
+class SSELogStream(LogStream):
+    """Log lines read from a panel event stream (pasarguard)"""
+
+    def _url(self, scheme: str, token: str) -> str:
+        return f"{scheme}://{self.panel_data.domain}{self.path}"
+
+    async def _consume(self, scheme: str, token: str):
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "text/event-stream",
+        }
+        async with httpx.AsyncClient(verify=_ssl_context) as client:
+            # no read timeout, the stream may stay quiet for long
+            timeout = httpx.Timeout(10, read=None)
+            async with client.stream("GET", self._url(scheme, token), headers=headers, timeout=timeout) as response:
+                response.raise_for_status()
+                await self._connected(scheme)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    log = parse_log_to_event(line.replace("data: ", "").strip(), self.node_name)
+                    if log:
+                        await self.ingest.put(log)
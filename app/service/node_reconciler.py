@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Coroutine
+
+from app.config import PANEL_CUSTOM_NODES, PANEL_NODE_RESET, PANEL_NODE_SYNC_INTERVAL
+from app.notification import reload_ad
+
+logger = logging.getLogger(__name__)
+
+# name -> (what the stream depends on, starts the stream)
+Streams = dict[str, tuple[tuple, Callable[[], Coroutine]]]
+
+
+def node_streams(nodes: list, start: Callable[[object], Coroutine]) -> Streams:
+    """The log streams of panel nodes, restarted when the node moves"""
+    if PANEL_CUSTOM_NODES:
+        nodes = [node for node in nodes if node.name in PANEL_CUSTOM_NODES]
+    return {f"{node.id}-{node.name}": ((node.address, node.port), lambda node=node: start(node))
+            for node in nodes}
+
+
+class NodeReconciler:
+    """Keeps one log task per panel node.
+
+    reconcile() compares the streams the panel wants with the running
+    tasks: new nodes are started, removed ones are stopped and tasks that
+    ended (or whose node got a new address) are restarted. Healthy streams
+    are left alone, so a sync doesn't drop any logs."""
+
+    def __init__(self):
+        self.tasks: dict[str, asyncio.Task] = {}
+        self._specs: dict[str, tuple] = {}
+
+    def reconcile(self, streams: Streams) -> dict[str, int]:
+        changes = {"started": 0, "stopped": 0, "restarted": 0}
+        for name in [name for name in self.tasks if name not in streams]:
+            logger.info(f"Stopping Task-{name}, the node is gone")
+            self._stop(name)
+            changes["stopped"] += 1
+
+        for name, (spec, start) in streams.items():
+            task = self.tasks.get(name)
+            if task is None:
+                changes["started"] += 1
+            elif task.done() or self._specs[name] != spec:
+                logger.info(f"Restarting Task-{name}")
+                self._stop(name)
+                changes["restarted"] += 1
+            else:
+                continue
+            self.tasks[name] = asyncio.create_task(start(), name=f"Task-{name}")
+            self.tasks[name].add_done_callback(self._ended)
+            self._specs[name] = spec
+
+        if any(changes.values()):
+            logger.info(f"nodes reconciled: {changes}, {len(self.tasks)} running")
+        return changes
+
+    def _stop(self, name: str):
+        self.tasks.pop(name).cancel()
+        del self._specs[name]
+
+    @staticmethod
+    def _ended(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{task.get_name()} failed: {task.exception()}")
+
+    async def run(self, get_streams: Callable[[], Awaitable[Streams]],
+                  interval: int = PANEL_NODE_SYNC_INTERVAL):
+        """Reconciles with the panel every `interval` seconds, until
+        cancelled, which stops every task. A fetch of the panel's nodes
+        gets at most `interval` seconds, when it fails the running streams
+        are kept until the next one"""
+        reloaded = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if time.monotonic() - reloaded >= PANEL_NODE_RESET:
+                    reloaded = time.monotonic()
+                    try:
+                        await asyncio.to_thread(reload_ad)
+                    except Exception as error:
+                        logger.error(f"failed to reload the ad: {error}")
+                try:
+                    streams = await asyncio.wait_for(get_streams(), interval)
+                except Exception as error:
+                    # the running streams are kept
+                    logger.error(f"failed to get the nodes from the panel: {error!r}")
+                    continue
+                self.reconcile(streams)
+        finally:
+            for name in list(self.tasks):
+                self._stop(name)
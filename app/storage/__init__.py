@@ -1,6 +1,10 @@
 """A module to store marznode data"""
 
 from .base import BaseStorage
+from .indexed import IndexedMemoryStorage
 from .memory import MemoryStorage
+from .sharded import ShardedStorage
+from .windowed import WindowedMemoryStorage
 
-__all__ = ["BaseStorage", "MemoryStorage"]
\ No newline at end of file
+__all__ = ["BaseStorage", "IndexedMemoryStorage",
+           "MemoryStorage", "ShardedStorage", "WindowedMemoryStorage"]
\ No newline at end of file
@@ -2,7 +2,7 @@
 
 from abc import ABC, abstractmethod
 
-from app.models.user import User
+from app.models.user import ConnectionEvent
 
 
 
@@ -10,9 +10,13 @@ class BaseStorage(ABC):
     """Base class for nobetci storage"""
 
     @abstractmethod
-    def add_user(self, user: User):
+    def add_user(self, user: ConnectionEvent):
         ""
 
+    def add_users(self, users: list[ConnectionEvent]):
+        for user in users:
+            self.add_user(user)
+
     @abstractmethod
     def get_user(self,username:str):
         ""
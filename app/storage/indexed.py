@@ -0,0 +1,55 @@
+"""Memory storage indexed by username and ip"""
+
+from app.models.user import ConnectionEvent
+from .base import BaseStorage
+
+
+class IndexedMemoryStorage(BaseStorage):
+    """Keeps an insertion ordered ip -> user map for every username,
+    so the first and last seen ip of a user are O(1) and adding or
+    deleting an ip doesn't scan the other users."""
+
+    def __init__(self):
+        self.storage: dict[str, dict[str, ConnectionEvent]] = {}
+
+    def add_user(self, user: ConnectionEvent):
+        ips = self.storage.get(user.name)
+        if ips is None:
+            self.storage[user.name] = {user.ip: user}
+        elif user.ip not in ips:
+            ips[user.ip] = user
+
+    def get_user(self, username: str):
+        ips = self.storage.get(username)
+        return next(iter(ips.values())) if ips else None
+
+    def get_last_user(self, username: str):
+        ips = self.storage.get(username)
+        return next(reversed(ips.values())) if ips else None
+
+    def get_users(self, username: str):
+        ips = self.storage.get(username)
+        return list(ips.values()) if ips else []
+
+    def get_user_by_ip(self, username: str, ip: str):
+        ips = self.storage.get(username)
+        return ips.get(ip) if ips else None
+
+    def get_user_diff_ip(self, username: str, ip: str):
+        ips = self.storage.get(username)
+        if not ips:
+            return None
+        return next((user for user_ip, user in ips.items() if user_ip != ip), None)
+
+    def delete_user(self, username: str, ip: str):
+        ips = self.storage.get(username)
+        if ips is None:
+            return
+        ips.pop(ip, None)
+        if not ips:
+            del self.storage[username]
+
+    def nextCount(self, username: str, ip: str):
+        user = self.get_user_diff_ip(username, ip)
+        if user is not None:
+            user.count += 1
@@ -1,4 +1,4 @@
-from app.models.user import User
+from app.models.user import ConnectionEvent
 from .base import BaseStorage
 
 
@@ -7,7 +7,7 @@ class MemoryStorage(BaseStorage):
     def __init__(self):
         self.storage = dict({"users": []})
 
-    def add_user(self, user: User):
+    def add_user(self, user: ConnectionEvent):
         if len(list(u for u in self.storage["users"] if u.name==user.name and u.ip == user.ip)):
             return
         self.storage["users"].append(user)
@@ -0,0 +1,166 @@
+"""Storage shared by nobetci instances through a redis server"""
+
+import time
+
+from redis.asyncio import Redis
+
+from app.config import BAN_LAST_USER, IUL, REPEAT_DECAY, STL
+from app.models.user import ConnectionEvent
+from .base import BaseStorage
+
+_SEPARATOR = "\x1f"
+
+
+class RedisStorage(BaseStorage):
+    """Keeps the users' ips in redis (or a redis compatible server), so
+    instances watching different nodes see each other's ips.
+
+    Every username has a sorted set of its ips scored by when they were
+    last seen, ips not seen for `window` seconds are dropped (0 keeps
+    them), and a hash of the ips' first seen time, node, inbound and
+    destination. Users are ordered by first seen like the memory
+    storages. The repeated out of limit counters are shared too and
+    decide() runs here, with the same rules as CheckService.decide.
+    Commands go out pipelined, usually one round trip per call.
+    Instances aren't locked against each other, two of them may decide
+    the same ban, the ban registry skips ips already banned. With a
+    window every key of a user expires once it isn't seen for that long.
+
+    The client has to decode responses. All methods are coroutines."""
+
+    def __init__(self, redis: Redis, window: int = 0, prefix: str = "nobetci"):
+        self._redis = redis
+        self.window = window
+        self._prefix = prefix
+
+    def _key(self, kind: str, username: str) -> str:
+        return f"{self._prefix}:{kind}:{username}"
+
+    @staticmethod
+    def _dump(user: ConnectionEvent, now: float) -> str:
+        return _SEPARATOR.join((repr(now), user.node or "", user.inbound or "", user.accepted or ""))
+
+    @staticmethod
+    def _load(username: str, ip: str, data: str, count) -> tuple[float, ConnectionEvent]:
+        first_seen, node, inbound, accepted = data.split(_SEPARATOR)
+        return float(first_seen), ConnectionEvent(
+            username, ip, inbound or None, accepted or None, node or None, int(count or 0))
+
+    def _add(self, pipe, user: ConnectionEvent, now: float):
+        seen, ips = self._key("seen", user.name), self._key("ips", user.name)
+        pipe.zadd(seen, {user.ip: now})
+        pipe.hsetnx(ips, user.ip, self._dump(user, now))
+        if self.window:
+            pipe.expire(seen, self.window)
+            pipe.expire(ips, self.window)
+            pipe.expire(self._key("count", user.name), self.window)
+
+    async def _users(self, username: str, add: ConnectionEvent | None = None) -> list[ConnectionEvent]:
+        """The user's ips in first seen order, after dropping the expired
+        ones and adding `add`"""
+        now = time.time()
+        seen, ips, counts = (self._key("seen", username), self._key("ips", username),
+                             self._key("count", username))
+        async with self._redis.pipeline(transaction=False) as pipe:
+            if self.window:
+                pipe.zrangebyscore(seen, "-inf", now - self.window)
+                pipe.zremrangebyscore(seen, "-inf", now - self.window)
+            if add is not None:
+                self._add(pipe, add, now)
+            pipe.zrange(seen, 0, -1)
+            pipe.hgetall(ips)
+            pipe.hgetall(counts)
+            results = await pipe.execute()
+        expired = results[0] if self.window else []
+        members, data, count = results[-3:]
+
+        if expired:
+            # their first seen time is gone with them, an expired ip seen
+            # again counts as a new one
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hdel(ips, *expired)
+                pipe.hdel(counts, *expired)
+                if add is not None and add.ip in expired:
+                    data[add.ip] = self._dump(add, now)
+                    pipe.hset(ips, add.ip, data[add.ip])
+                await pipe.execute()
+
+        users = sorted((self._load(username, ip, data[ip], count.get(ip))
+                        for ip in members if ip in data), key=lambda entry: entry[0])
+        return [user for _, user in users]
+
+    async def add_user(self, user: ConnectionEvent):
+        await self.add_users([user])
+
+    async def add_users(self, users: list[ConnectionEvent]):
+        now = time.time()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user in users:
+                self._add(pipe, user, now)
+            await pipe.execute()
+
+    async def get_user(self, username: str):
+        users = await self._users(username)
+        return users[0] if users else None
+
+    async def get_last_user(self, username: str):
+        users = await self._users(username)
+        return users[-1] if users else None
+
+    async def get_users(self, username: str):
+        return await self._users(username)
+
+    async def get_user_by_ip(self, username: str, ip: str):
+        return next((user for user in await self._users(username) if user.ip == ip), None)
+
+    async def get_user_diff_ip(self, username: str, ip: str):
+        return next((user for user in await self._users(username) if user.ip != ip), None)
+
+    async def delete_user(self, username: str, ip: str):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            self._delete(pipe, username, ip)
+            await pipe.execute()
+
+    def _delete(self, pipe, username: str, ip: str):
+        pipe.zrem(self._key("seen", username), ip)
+        pipe.hdel(self._key("ips", username), ip)
+        pipe.hdel(self._key("count", username), ip)
+
+    async def nextCount(self, username: str, ip: str):
+        user = await self.get_user_diff_ip(username, ip)
+        if user is not None:
+            counts = self._key("count", username)
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(counts, user.ip, 1)
+                if self.window:
+                    pipe.expire(counts, self.window)
+                await pipe.execute()
+
+    async def decide(self, user: ConnectionEvent, user_limit: int, hits: int = 1):
+        users = await self._users(user.name, add=user)
+        if len(users) <= user_limit:
+            return None
+        userByEmail, userLast = users[0], users[-1]
+
+        # the counters decay per user, not per ip
+        repeats = self._key("repeats", user.name)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(repeats, user.ip, hits)
+            if REPEAT_DECAY:
+                pipe.expire(repeats, REPEAT_DECAY)
+            pipe.hmget(repeats, userByEmail.ip, userLast.ip)
+            rl_len, rl_last_len = (int(count or 0) for count in (await pipe.execute())[-1])
+
+        if rl_len < STL or rl_last_len < STL:
+            if abs(rl_len - rl_last_len) > IUL:
+                await self._reset(user.name, userByEmail.ip)
+            return False
+        await self._reset(user.name, userByEmail.ip)
+        return (userLast if BAN_LAST_USER else userByEmail), userByEmail
+
+    async def _reset(self, username: str, ip: str):
+        """Resets the user's counters and forgets its first ip"""
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(self._key("repeats", username))
+            self._delete(pipe, username, ip)
+            await pipe.execute()
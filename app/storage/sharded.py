@@ -0,0 +1,145 @@
+"""Storage partitioned across worker processes by username"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+import threading
+import zlib
+
+from app.models.user import ConnectionEvent
+from .base import BaseStorage
+
+logger = logging.getLogger(__name__)
+
+
+def _run_shard(conn: Connection, window: int):
+    """Entry point of a shard process, owns the storage and the repeated
+    out of limit counters of its users and answers requests one by one"""
+    from app.service.check_service import CheckService
+    from .indexed import IndexedMemoryStorage
+    from .windowed import WindowedMemoryStorage
+
+    storage = WindowedMemoryStorage(window) if window else IndexedMemoryStorage()
+    service = CheckService(storage, None)
+
+    while True:
+        try:
+            request_id, op, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            if window:
+                storage.sweep()
+            if op == "decide":
+                result = service.decide(*args)
+            else:
+                result = getattr(storage, op)(*args)
+            conn.send((request_id, result, None))
+        except Exception as error:
+            conn.send((request_id, None, repr(error)))
+
+
+class _Shard:
+
+    def __init__(self, index: int, window: int):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_run_shard, args=(child_conn, window),
+            name=f"nobetci-shard-{index}", daemon=True)
+        self._process.start()
+        child_conn.close()
+
+        self._loop = asyncio.get_running_loop()
+        self._ids = itertools.count()
+        self._pending: dict[int, asyncio.Future] = {}
+        threading.Thread(target=self._read, daemon=True,
+                         name=f"nobetci-shard-reader-{index}").start()
+
+    def _read(self):
+        while True:
+            try:
+                response = self._conn.recv()
+            except (EOFError, OSError):
+                if not self._loop.is_closed():
+                    logger.error(f"{self._process.name} exited")
+                    self._loop.call_soon_threadsafe(self._fail_pending)
+                return
+            self._loop.call_soon_threadsafe(self._resolve, *response)
+
+    def _fail_pending(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self._process.name} exited"))
+        self._pending.clear()
+
+    def _resolve(self, request_id: int, result, error: str | None):
+        future = self._pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(result)
+
+    async def call(self, op: str, *args):
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = future
+        self._conn.send((request_id, op, args))
+        return await future
+
+
+class ShardedStorage(BaseStorage):
+    """Partitions users over `shards` processes by a stable hash of the
+    username. Every shard keeps its users' ips and repeated out of limit
+    counters and runs CheckService.decide for them, so limit enforcement
+    doesn't share state between shards. All methods are coroutines."""
+
+    def __init__(self, shards: int, window: int = 0):
+        self._shards_count = shards
+        self._window = window
+        self._shards: list[_Shard] = []
+
+    def _shard(self, username: str) -> _Shard:
+        if not self._shards:
+            self._shards = [_Shard(i, self._window)
+                            for i in range(self._shards_count)]
+        return self._shards[zlib.crc32(username.encode()) % self._shards_count]
+
+    async def decide(self, user: ConnectionEvent, user_limit: int, hits: int = 1):
+        return await self._shard(user.name).call("decide", user, user_limit, hits)
+
+    async def add_user(self, user: ConnectionEvent):
+        return await self._shard(user.name).call("add_user", user)
+
+    async def add_users(self, users: list[ConnectionEvent]):
+        """One request per shard with the users it owns"""
+        by_shard: dict[_Shard, list[ConnectionEvent]] = {}
+        for user in users:
+            by_shard.setdefault(self._shard(user.name), []).append(user)
+        await asyncio.gather(*(shard.call("add_users", shard_users)
+                               for shard, shard_users in by_shard.items()))
+
+    async def get_user(self, username: str):
+        return await self._shard(username).call("get_user", username)
+
+    async def get_last_user(self, username: str):
+        return await self._shard(username).call("get_last_user", username)
+
+    async def get_users(self, username: str):
+        return await self._shard(username).call("get_users", username)
+
+    async def get_user_by_ip(self, username: str, ip: str):
+        return await self._shard(username).call("get_user_by_ip", username, ip)
+
+    async def get_user_diff_ip(self, username: str, ip: str):
+        return await self._shard(username).call("get_user_diff_ip", username, ip)
+
+    async def delete_user(self, username: str, ip: str):
+        return await self._shard(username).call("delete_user", username, ip)
+
+    async def nextCount(self, username: str, ip: str):
+        return await self._shard(username).call("nextCount", username, ip)
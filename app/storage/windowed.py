@@ -0,0 +1,64 @@
+"""Memory storage that forgets ips which weren't seen for a while"""
+
+import asyncio
+import heapq
+import time
+
+from app.models.user import ConnectionEvent
+from .indexed import IndexedMemoryStorage
+
+
+class WindowedMemoryStorage(IndexedMemoryStorage):
+    """Indexed storage where every (username, ip) carries its last seen
+    time. Entries that weren't seen in the last `window` seconds are
+    evicted, so get_users returns the ips seen inside the window.
+
+    Expiry deadlines are kept in a heap, the sweeper only pops the
+    entries that are due and re-schedules the ones refreshed since."""
+
+    def __init__(self, window: int):
+        super().__init__()
+        self.window = window
+        # (username, ip) -> [last seen, scheduled deadline]
+        self._seen: dict[tuple[str, str], list[float]] = {}
+        self._deadlines: list[tuple[float, str, str]] = []
+
+    def add_user(self, user: ConnectionEvent):
+        now = time.monotonic()
+        self.sweep(now)
+
+        key = (user.name, user.ip)
+        seen = self._seen.get(key)
+        if seen is None:
+            deadline = now + self.window
+            self._seen[key] = [now, deadline]
+            heapq.heappush(self._deadlines, (deadline, user.name, user.ip))
+        else:
+            seen[0] = now
+
+        super().add_user(user)
+
+    def delete_user(self, username: str, ip: str):
+        self._seen.pop((username, ip), None)
+        super().delete_user(username, ip)
+
+    def sweep(self, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            deadline, username, ip = heapq.heappop(deadlines)
+            seen = self._seen.get((username, ip))
+            if seen is None or seen[1] != deadline:
+                # deleted or re-added after this deadline was scheduled
+                continue
+            expires_at = seen[0] + self.window
+            if expires_at > now:
+                seen[1] = expires_at
+                heapq.heappush(deadlines, (expires_at, username, ip))
+                continue
+            self.delete_user(username, ip)
+
+    async def run_sweeper(self, interval: float = 1):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
@@ -1,16 +1,17 @@
 import asyncio
-from app.config import SYNC_WITH_PANEL, PANEL_ADDRESS, PANEL_CUSTOM_NODES, PANEL_PASSWORD, PANEL_USERNAME
+from app.config import SYNC_WITH_PANEL, PANEL_ADDRESS, PANEL_PASSWORD, PANEL_USERNAME
 from app.models.panel import Panel
 from app.service.check_service import CheckService
-from app.service.marznode_service import TASKS, MarzNodeService
+from app.service.marznode_service import MarzNodeService
 from app.tasks.nodes import nodes_startup
 from app.utils.panel.marzneshin_panel import get_marznodes, get_token
 from app import user_limit_db, storage, panel_db
+from app.utils.awaitable import maybe_await
 from app.db import node_db
 
 
 async def start_marznode_tasks():
-    await nodes_startup(node_db.get_all(True))
+    await nodes_startup(await maybe_await(node_db.get_all(True)))
 
     if panel_db:
         paneltype = panel_db.panel
@@ -27,19 +28,20 @@ async def start_marznode_tasks():
         except Exception:
             pass
 
+    if SYNC_WITH_PANEL and panel_db:
+        await panel_db.initial_sync()
+
     node_service = MarzNodeService(CheckService(
         storage, panel_db if (SYNC_WITH_PANEL and panel_db) else user_limit_db))
 
     marznodes = await get_marznodes(paneltype)
 
-    if PANEL_CUSTOM_NODES:
-        marznodes = [m for m in marznodes if m.name in PANEL_CUSTOM_NODES]
+    node_service.reconciler.reconcile(node_service.streams(paneltype, marznodes))
 
     async with asyncio.TaskGroup() as tg:
         tg.create_task(
-            node_service.handle_cancel_all(TASKS, paneltype),
-            name="cancel_all",
+            node_service.reconcile_nodes(paneltype),
+            name="reconcile_nodes",
         )
-        
-        for marznode in marznodes:
-            await node_service.create_node_task(paneltype, tg, marznode)
+        if SYNC_WITH_PANEL and panel_db:
+            tg.create_task(panel_db.run_sync(), name="panel_sync")
@@ -1,16 +1,17 @@
 import asyncio
-from app.config import PANEL_ADDRESS, PANEL_CUSTOM_NODES, PANEL_PASSWORD, PANEL_USERNAME
+from app.config import PANEL_ADDRESS, PANEL_PASSWORD, PANEL_USERNAME
 from app.models.panel import Panel
 from app.service.check_service import CheckService
-from app.service.pg_node_service import TASKS, PGNodeService
+from app.service.pg_node_service import PGNodeService
 from app.tasks.nodes import nodes_startup
 from app import user_limit_db, storage
+from app.utils.awaitable import maybe_await
 from app.db import node_db
 from app.utils.panel.pasarguard_panel import get_pg_nodes
 
 
 async def start_pg_node_tasks():
-    await nodes_startup(node_db.get_all(True))
+    await nodes_startup(await maybe_await(node_db.get_all(True)))
 
     paneltype = Panel(
         username=PANEL_USERNAME,
@@ -23,13 +24,10 @@ async def start_pg_node_tasks():
 
     pg_nodes = await get_pg_nodes(paneltype)
 
-    if PANEL_CUSTOM_NODES:
-        pg_nodes = [m for m in pg_nodes if m.name in PANEL_CUSTOM_NODES]
+    node_service.reconciler.reconcile(node_service.streams(paneltype, pg_nodes))
 
     async with asyncio.TaskGroup() as tg:
-        for pg_node in pg_nodes:
-            await node_service.create_node_task(paneltype, tg, pg_node)
         tg.create_task(
-            node_service.handle_cancel_all(TASKS, paneltype),
-            name="cancel_all",
+            node_service.reconcile_nodes(paneltype),
+            name="reconcile_nodes",
         )
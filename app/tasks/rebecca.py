@@ -1,14 +1,14 @@
 import asyncio
 import logging
 from app.config import PANEL_ADDRESS, PANEL_CUSTOM_NODES, PANEL_PASSWORD, PANEL_USERNAME, SYNC_WITH_PANEL
-from app.db.rebecca_db import RebeccaDB
 from app.models.node import NodeStatus
 from app.models.panel import Panel
 from app.service.check_service import CheckService
-from app.service.rebecca_service import RebeccaService, TASKS
-from app import user_limit_db, storage
+from app.service.rebecca_service import RebeccaService
+from app import user_limit_db, storage, panel_db
 from app.tasks.nodes import nodes_startup
-from app.utils.panel.rebecca_panel import get_rebecca_nodes, get_token
+from app.utils.panel.rebecca_panel import get_rebecca_nodes
+from app.utils.awaitable import maybe_await
 from app.db import models, node_db
 
 logger = logging.getLogger(__name__)
@@ -21,8 +21,11 @@ async def start_rebecca_node_tasks():
         domain=PANEL_ADDRESS,
     )
 
+    if SYNC_WITH_PANEL and panel_db:
+        await panel_db.initial_sync()
+
     node_service = RebeccaService(CheckService(
-        storage, SYNC_WITH_PANEL and RebeccaDB(await get_token(paneltype)) or user_limit_db))
+        storage, panel_db if (SYNC_WITH_PANEL and panel_db) else user_limit_db))
 
     rebecca_nodes = await get_rebecca_nodes(paneltype, SYNC_WITH_PANEL)
 
@@ -30,7 +33,7 @@ async def start_rebecca_node_tasks():
         rebecca_nodes = [
             m for m in rebecca_nodes if m.name in PANEL_CUSTOM_NODES]
 
-    await nodes_startup(node_db.get_all(True) + (SYNC_WITH_PANEL and [models.Node(**{
+    await nodes_startup(await maybe_await(node_db.get_all(True)) + (SYNC_WITH_PANEL and [models.Node(**{
         "id": 1000 + n.id,
         "name": n.name,
         "address": n.address,
@@ -39,12 +42,12 @@ async def start_rebecca_node_tasks():
         "message": ""
     }) for n in rebecca_nodes] or []))
 
-    async with asyncio.TaskGroup() as tg:
-        (not PANEL_CUSTOM_NODES or 'core' in PANEL_CUSTOM_NODES) and await node_service.create_core_task(paneltype, tg)
+    node_service.reconciler.reconcile(node_service.streams(paneltype, rebecca_nodes))
 
-        for rebecca_node in rebecca_nodes:
-            await node_service.create_node_task(paneltype, tg, rebecca_node)
+    async with asyncio.TaskGroup() as tg:
         tg.create_task(
-            node_service.handle_cancel_all(TASKS, paneltype),
-            name="cancel_all",
+            node_service.reconcile_nodes(paneltype),
+            name="reconcile_nodes",
         )
+        if SYNC_WITH_PANEL and panel_db:
+            tg.create_task(panel_db.run_sync(), name="panel_sync")
@@ -16,7 +16,8 @@ from app.config import TELEGRAM_API_TOKEN, SYNC_WITH_PANEL
 from app import user_limit_db, storage, panel_db
 from app.db.models import UserLimit
 from app.models.user import User
-from app.nobetnode import nodes
+from app.service.ban_registry import ban_registry
+from app.utils.awaitable import maybe_await
 from app.utils.telegram import restricted
 
 logger = logging.getLogger(__name__)
@@ -37,6 +38,7 @@ async def build_telegram_bot():
         return
 
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("bans", bans))
     application.add_handler(
         ConversationHandler(
             entry_points=[CommandHandler("add_user", add_user)],
@@ -112,11 +114,10 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         ip = ipaddress.ip_address(data)
-        for node in nodes.keys():
-            try:
-                await nodes[node].UnBanUser(User(name="", status=None, ip=data, count=0))
-            except Exception as err:
-                await context.bot.send_message(chat_id=update.effective_chat.id, text=f'error (node: {node}): {err}')
+        results = await ban_registry.unban([User(name="", status=None, ip=data, count=0)])
+        for node, result in results.items():
+            if not result["success"]:
+                await context.bot.send_message(chat_id=update.effective_chat.id, text=f'error (node: {node}): {result.get("error") or result["results"]}')
         msg = f"✅ {data} unbanned successfully"
     except ValueError:
         msg = f"❌ {data} is not a valid IP address"
@@ -151,11 +152,11 @@ async def get_user_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             pass
 
     if not user or (SYNC_WITH_PANEL and user.limit == 0):
-        local_user = user_limit_db.get(UserLimit.name == username)
+        local_user = await maybe_await(user_limit_db.get(UserLimit.name == username))
         if local_user:
             user = local_user
 
-    if not user or (user.limit == 0 and not user_limit_db.get(UserLimit.name == username)):
+    if not user or (user.limit == 0 and not await maybe_await(user_limit_db.get(UserLimit.name == username))):
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text="User Isn't Exists"
@@ -181,7 +182,7 @@ async def add_user(update: Update, _context: ContextTypes.DEFAULT_TYPE):
 async def add_user_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["name"] = update.message.text.strip()
 
-    if user_limit_db.get(UserLimit.name == context.user_data["name"]):
+    if await maybe_await(user_limit_db.get(UserLimit.name == context.user_data["name"])):
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text="User Is Exists"
@@ -206,8 +207,8 @@ async def add_user_limit(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return ConversationHandler.END
 
-    user_limit_db.add(
-        {"name": context.user_data["name"], "limit": context.user_data["limit"]})
+    await maybe_await(user_limit_db.add(
+        {"name": context.user_data["name"], "limit": context.user_data["limit"]}))
 
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -228,7 +229,7 @@ async def update_user(update: Update, _context: ContextTypes.DEFAULT_TYPE):
 async def update_user_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["name"] = update.message.text.strip()
 
-    if not user_limit_db.get(UserLimit.name == context.user_data["name"]):
+    if not await maybe_await(user_limit_db.get(UserLimit.name == context.user_data["name"])):
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text="User Isn't Exists"
@@ -253,8 +254,8 @@ async def update_user_limit(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return ConversationHandler.END
 
-    user_limit_db.update(UserLimit.name == context.user_data["name"], {
-        "limit": context.user_data["limit"]})
+    await maybe_await(user_limit_db.update(UserLimit.name == context.user_data["name"], {
+        "limit": context.user_data["limit"]}))
 
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -275,14 +276,14 @@ async def delete_user(update: Update, _context: ContextTypes.DEFAULT_TYPE):
 async def delete_user_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["name"] = update.message.text.strip()
 
-    if not user_limit_db.get(UserLimit.name == context.user_data["name"]):
+    if not await maybe_await(user_limit_db.get(UserLimit.name == context.user_data["name"])):
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text="User Isn't Exists"
         )
         return ConversationHandler.END
 
-    user_limit_db.delete(UserLimit.name == context.user_data["name"])
+    await maybe_await(user_limit_db.delete(UserLimit.name == context.user_data["name"]))
 
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -304,7 +305,7 @@ async def active_ips_user_name(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data["name"] = update.message.text.strip()
 
     userips = list(
-        map(lambda x: x.ip, storage.get_users(context.user_data["name"])))
+        map(lambda x: x.ip, await maybe_await(storage.get_users(context.user_data["name"]))))
 
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -312,6 +313,17 @@ async def active_ips_user_name(update: Update, context: ContextTypes.DEFAULT_TYP
     )
     return ConversationHandler.END
 
+@restricted
+async def bans(update: Update, _context: ContextTypes.DEFAULT_TYPE):
+    active = sorted(ban_registry.get_all(), key=lambda ban: ban.expires_at)
+    lines = [f"{ban.ip} ({ban.name}) until {ban.expires_at:%H:%M:%S}, nodes: {len(ban.nodes)}"
+             for ban in active[:50]]
+    if len(active) > 50:
+        lines.append(f"... and {len(active) - 50} more")
+    await update.message.reply_text(
+        text=f"{len(active)} active bans\n" + "\n".join(lines))
+
+
 START_MESSAGE = """
 <b>Commands List:</b>
 <b>/start</b>
@@ -331,4 +343,7 @@ START_MESSAGE = """
 
 <b>/user_active_ips</b>
 <code>👥 Get user Active IPs</code>
+
+<b>/bans</b>
+<code>🚫 Active Bans</code>
 """
@@ -0,0 +1,8 @@
+import inspect
+
+
+async def maybe_await(value):
+    """Awaits the value when a sync/async backend (storage, db) returned a coroutine"""
+    if inspect.isawaitable(value):
+        return await value
+    return value
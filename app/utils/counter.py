@@ -0,0 +1,53 @@
+import time
+
+
+class RepeatCounter:
+    """Counts repeated (name, ip) hits.
+
+    Counts are grouped by name so all ips of a name can be reset at once.
+    A count that wasn't incremented for `decay` seconds reads as zero and
+    is dropped by the next prune, 0 disables the decay."""
+
+    def __init__(self, decay: int = 0):
+        self.decay = decay
+        # name -> ip -> [count, last increment]
+        self._counts: dict[str, dict[str, list]] = {}
+        self._last_prune = time.monotonic()
+
+    def _is_stale(self, entry: list, now: float) -> bool:
+        return bool(self.decay) and now - entry[1] > self.decay
+
+    def increment(self, name: str, ip: str, amount: int = 1) -> int:
+        now = time.monotonic()
+        if self.decay and now - self._last_prune > self.decay:
+            self.prune(now)
+
+        ips = self._counts.setdefault(name, {})
+        entry = ips.get(ip)
+        if entry is None or self._is_stale(entry, now):
+            ips[ip] = entry = [0, now]
+        entry[0] += amount
+        entry[1] = now
+        return entry[0]
+
+    def get(self, name: str, ip: str) -> int:
+        entry = self._counts.get(name, {}).get(ip)
+        if entry is None or self._is_stale(entry, time.monotonic()):
+            return 0
+        return entry[0]
+
+    def reset(self, name: str):
+        self._counts.pop(name, None)
+
+    def prune(self, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self._last_prune = now
+        for name in list(self._counts):
+            ips = self._counts[name]
+            for ip in [ip for ip, entry in ips.items() if self._is_stale(entry, now)]:
+                del ips[ip]
+            if not ips:
+                del self._counts[name]
+
+    def __len__(self):
+        return sum(len(ips) for ips in self._counts.values())
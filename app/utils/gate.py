@@ -0,0 +1,54 @@
+import time
+
+
+class ConnectionGate:
+    """Remembers (name, ip) pairs whose last check found the user within
+    its limit, their repeated log lines are skipped for `interval` seconds
+    instead of being checked again. Pairs not seen recently and every ip
+    of a user out of limit always go through, so detection isn't delayed.
+    0 disables the gate.
+
+    Skipped lines don't refresh the pair's last seen time in a storage
+    forgetting ips after `window` seconds, so with a window a pair is let
+    through again at least every half window and stays in the storage
+    while its lines keep coming."""
+
+    def __init__(self, interval: float = 0, window: float = 0):
+        self.interval = min(interval, window / 2) if window else interval
+        # name -> ip -> checked until
+        self._pairs: dict[str, dict[str, float]] = {}
+        self._last_prune = time.monotonic()
+        self.skipped = 0
+
+    def allow(self, name: str, ip: str) -> bool:
+        if not self.interval:
+            return True
+        now = time.monotonic()
+        if now - self._last_prune > self.interval:
+            self.prune(now)
+
+        until = self._pairs.get(name, {}).get(ip)
+        if until is None or now >= until:
+            return True
+        self.skipped += 1
+        return False
+
+    def remember(self, name: str, ip: str):
+        if self.interval:
+            self._pairs.setdefault(name, {})[ip] = time.monotonic() + self.interval
+
+    def forget(self, name: str):
+        self._pairs.pop(name, None)
+
+    def prune(self, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self._last_prune = now
+        for name in list(self._pairs):
+            ips = self._pairs[name]
+            for ip in [ip for ip, until in ips.items() if now >= until]:
+                del ips[ip]
+            if not ips:
+                del self._pairs[name]
+
+    def __len__(self) -> int:
+        return sum(map(len, self._pairs.values()))
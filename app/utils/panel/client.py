@@ -0,0 +1,46 @@
+import httpx
+
+from app.config import PANEL_MAX_CONNECTIONS
+
+_SCHEMES = ["https", "http"]
+
+
+class PanelClient(httpx.AsyncClient):
+    """Long lived client of one panel, connections are kept alive (HTTP/2
+    when the panel supports it) and the scheme that worked is tried first
+    on the next requests"""
+
+    def __init__(self, domain: str):
+        super().__init__(
+            verify=False,
+            http2=True,
+            limits=httpx.Limits(max_connections=PANEL_MAX_CONNECTIONS,
+                                max_keepalive_connections=PANEL_MAX_CONNECTIONS,
+                                keepalive_expiry=60),
+        )
+        self.domain = domain
+        self.scheme: str | None = None
+
+    def schemes(self) -> list[str]:
+        if self.scheme is None:
+            return _SCHEMES
+        return [self.scheme] + [scheme for scheme in _SCHEMES if scheme != self.scheme]
+
+    def remember(self, scheme: str):
+        self.scheme = scheme
+
+
+_clients: dict[str, PanelClient] = {}
+
+
+def get_client(domain: str) -> PanelClient:
+    client = _clients.get(domain)
+    if client is None or client.is_closed:
+        client = _clients[domain] = PanelClient(domain)
+    return client
+
+
+async def close_clients():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
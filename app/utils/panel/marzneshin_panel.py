@@ -7,40 +7,33 @@ import asyncio
 import random
 
 from app.notification.telegram import send_notification
+from app.utils.panel.client import get_client
+from app.utils.panel.token import tokens
 
 logger = logging.getLogger(__name__)
 
-async def get_token(panel_data: Panel) -> Panel | ValueError:
-    if panel_data.token:
-        return panel_data
-
+async def _login(panel_data: Panel) -> str:
     payload = {
         "username": f"{panel_data.username}",
         "password": f"{panel_data.password}",
     }
     for attempt in range(20):
-        for scheme in ["https","http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/admins/token"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.post(url, data=payload, timeout=5)
-                    response.raise_for_status()
+                response = await client.post(url, data=payload, timeout=5)
+                response.raise_for_status()
+                client.remember(scheme)
                 json_obj = response.json()
-                panel_data.token = json_obj["access_token"]
-                return panel_data
+                return json_obj["access_token"]
             except httpx.HTTPStatusError:
-                message = f"[{response.status_code}] {response.text}"
-                await send_notification(message)
-                logger.error(message)
-                print(message)
+                logger.error(f"[{response.status_code}] {response.text}")
                 continue
             except SSLError:
                 continue
             except Exception as error:
-                message = f"An unexpected error occurred: {error}"
-                await send_notification(message)
-                logger.error(message)
-                print(message)
+                logger.error(f"An unexpected error occurred: {error}")
                 continue
         await asyncio.sleep(random.randint(2, 5) * attempt)
     message = (
@@ -51,8 +44,15 @@ async def get_token(panel_data: Panel) -> Panel | ValueError:
     logger.error(message)
     raise ValueError(message)
 
-async def get_marznodes(panel_data: Panel) -> list[MarzNode] | ValueError:
-    for attempt in range(20):
+async def get_token(panel_data: Panel) -> Panel | ValueError:
+    return await tokens.get(panel_data, _login)
+
+
+async def get_marznodes(panel_data: Panel, retry: bool = True) -> list[MarzNode] | ValueError:
+    """Nodes of the panel, the panel is tried up to 20 times, or once
+    without `retry`"""
+    attempts = 20 if retry else 1
+    for attempt in range(attempts):
         get_panel_token = await get_token(panel_data)
         if isinstance(get_panel_token, ValueError):
             raise get_panel_token
@@ -61,17 +61,19 @@ async def get_marznodes(panel_data: Panel) -> list[MarzNode] | ValueError:
             "Authorization": f"Bearer {token}",
         }
         all_nodes = []
-        for scheme in ["https","http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/nodes?status=healthy"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
+                response = await client.get(url, headers=headers, timeout=10)
 
-                    if response.status_code == 401:
-                        panel_data.token = None
-                        continue
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
+                    break
                     
-                    response.raise_for_status()
+                response.raise_for_status()
+                    
+                client.remember(scheme)
                 user_inform = response.json()
                 items = user_inform.get("items", []) if isinstance(user_inform, dict) else user_inform
                 for node in items:
@@ -94,12 +96,14 @@ async def get_marznodes(panel_data: Panel) -> list[MarzNode] | ValueError:
             except Exception as error:
                 logger.error(f"An unexpected error occurred: {error}")
                 continue
-        await asyncio.sleep(random.randint(2, 5) * attempt)
+        if attempt + 1 < attempts:
+            await asyncio.sleep(random.randint(2, 5) * attempt)
     message = (
-        "Failed to get nodes after 20 attempts. make sure the panel is running "
+        f"Failed to get nodes after {attempts} attempts. make sure the panel is running "
         + "and the username and password are correct."
     )
-    await send_notification(message)
+    if retry:
+        await send_notification(message)
     logger.error(message)
     raise ValueError(message)
 
@@ -113,23 +117,57 @@ async def get_user(username: str, panel_data: Panel) -> dict | None:
             "Authorization": f"Bearer {token}",
             "Accept": "application/json"
         }
-        for scheme in ["https", "http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/users/{username}"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
+                response = await client.get(url, headers=headers, timeout=10)
                     
-                    if response.status_code == 401:
-                        panel_data.token = None
-                        continue
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
+                    break
 
-                    if response.status_code == 404:
-                        return None
+                if response.status_code == 404:
+                    return None
                         
-                    response.raise_for_status()
-                    return response.json()
+                response.raise_for_status()
+                        
+                client.remember(scheme)
+                return response.json()
             except Exception as error:
                 logger.error(f"Error fetching user {username}: {error}")
                 continue
         await asyncio.sleep(1)
-    return None
+    raise ValueError(f"Failed to get user {username} after 5 attempts")
+
+
+async def get_users_page(panel_data: Panel, offset: int, size: int) -> tuple[list[dict], int]:
+    """One page of the user listing and the total number of users"""
+    for attempt in range(5):
+        token = (await get_token(panel_data)).token
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json"
+        }
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
+            url = f"{scheme}://{panel_data.domain}/api/users"
+            try:
+                response = await client.get(
+                    url, headers=headers, timeout=30,
+                    params={"page": offset // size + 1, "size": size})
+
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
+                    break
+
+                response.raise_for_status()
+
+                client.remember(scheme)
+                page = response.json()
+                return page["items"], page["total"]
+            except Exception as error:
+                logger.error(f"Error fetching users page at {offset}: {error}")
+                continue
+        await asyncio.sleep(1)
+    raise ValueError("Failed to get the user list after 5 attempts")
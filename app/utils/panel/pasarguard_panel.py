@@ -7,35 +7,33 @@ import random
 
 from app.models.pg_node import PGNode
 from app.notification.telegram import send_notification
+from app.utils.panel.client import get_client
+from app.utils.panel.token import tokens
 
 logger = logging.getLogger(__name__)
 
-async def get_token(panel_data: Panel) -> Panel | ValueError:
+async def _login(panel_data: Panel) -> str:
     payload = {
         "username": f"{panel_data.username}",
         "password": f"{panel_data.password}",
     }
     for attempt in range(20):
-        for scheme in ["https","http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/admin/token"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.post(url, data=payload, timeout=5)
-                    response.raise_for_status()
+                response = await client.post(url, data=payload, timeout=5)
+                response.raise_for_status()
+                client.remember(scheme)
                 json_obj = response.json()
-                panel_data.token = json_obj["access_token"]
-                return panel_data
+                return json_obj["access_token"]
             except httpx.HTTPStatusError:
-                message = f"[{response.status_code}] {response.text}"
-                await send_notification(message)
-                logger.error(message)
+                logger.error(f"[{response.status_code}] {response.text}")
                 continue
             except SSLError:
                 continue
             except Exception as error:
-                message = f"An unexpected error occurred: {error}"
-                await send_notification(message)
-                logger.error(message)
+                logger.error(f"An unexpected error occurred: {error}")
                 continue
         await asyncio.sleep(random.randint(2, 5) * attempt)
     message = (
@@ -46,8 +44,15 @@ async def get_token(panel_data: Panel) -> Panel | ValueError:
     logger.error(message)
     raise ValueError(message)
 
-async def get_pg_nodes(panel_data: Panel) -> list[PGNode] | ValueError:
-    for attempt in range(20):
+async def get_token(panel_data: Panel) -> Panel | ValueError:
+    return await tokens.get(panel_data, _login)
+
+
+async def get_pg_nodes(panel_data: Panel, retry: bool = True) -> list[PGNode] | ValueError:
+    """Nodes of the panel, the panel is tried up to 20 times, or once
+    without `retry`"""
+    attempts = 20 if retry else 1
+    for attempt in range(attempts):
         get_panel_token = await get_token(panel_data)
         if isinstance(get_panel_token, ValueError):
             raise get_panel_token
@@ -56,12 +61,13 @@ async def get_pg_nodes(panel_data: Panel) -> list[PGNode] | ValueError:
             "Authorization": f"Bearer {token}",
         }
         all_nodes = []
-        for scheme in ["https","http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/nodes?status=connected"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    response.raise_for_status()
+                response = await client.get(url, headers=headers, timeout=10)
+                response.raise_for_status()
+                client.remember(scheme)
                 user_inform = response.json()
                 for node in user_inform["nodes"]:
                     all_nodes.append(
@@ -78,22 +84,21 @@ async def get_pg_nodes(panel_data: Panel) -> list[PGNode] | ValueError:
             except SSLError:
                 continue
             except httpx.HTTPStatusError:
-                message = f"[{response.status_code}] {response.text}"
-                await send_notification(message)
-                logger.error(message)
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
+                logger.error(f"[{response.status_code}] {response.text}")
                 continue
             except Exception as error:
-                message = f"An unexpected error occurred: {error}"
-                await send_notification(message)
-                logger.error(message)
-                print(message)
+                logger.error(f"An unexpected error occurred: {error}")
                 continue
-        await asyncio.sleep(random.randint(2, 5) * attempt)
+        if attempt + 1 < attempts:
+            await asyncio.sleep(random.randint(2, 5) * attempt)
     message = (
-        "Failed to get nodes after 20 attempts. make sure the panel is running "
+        f"Failed to get nodes after {attempts} attempts. make sure the panel is running "
         + "and the username and password are correct."
     )
-    await send_notification(message)
+    if retry:
+        await send_notification(message)
     logger.error(message)
     raise ValueError(message)
 
@@ -7,36 +7,34 @@ import random
 
 from app.models.rebecca_node import RebeccaNode
 from app.notification.telegram import send_notification
+from app.utils.panel.client import get_client
+from app.utils.panel.token import tokens
 
 logger = logging.getLogger(__name__)
 
 
-async def get_token(panel_data: Panel) -> Panel | ValueError:
+async def _login(panel_data: Panel) -> str:
     payload = {
         "username": f"{panel_data.username}",
         "password": f"{panel_data.password}",
     }
     for attempt in range(20):
-        for scheme in ["https", "http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/admin/token"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.post(url, data=payload, timeout=5)
-                    response.raise_for_status()
+                response = await client.post(url, data=payload, timeout=5)
+                response.raise_for_status()
+                client.remember(scheme)
                 json_obj = response.json()
-                panel_data.token = json_obj["access_token"]
-                return panel_data
+                return json_obj["access_token"]
             except httpx.HTTPStatusError:
-                message = f"[{response.status_code}] {response.text}"
-                await send_notification(message)
-                logger.error(message)
+                logger.error(f"[{response.status_code}] {response.text}")
                 continue
             except SSLError:
                 continue
             except Exception as error:
-                message = f"An unexpected error occurred: {error}"
-                await send_notification(message)
-                logger.error(message)
+                logger.error(f"An unexpected error occurred: {error}")
                 continue
         await asyncio.sleep(random.randint(2, 5) * attempt)
     message = (
@@ -48,8 +46,15 @@ async def get_token(panel_data: Panel) -> Panel | ValueError:
     raise ValueError(message)
 
 
-async def get_rebecca_nodes(panel_data: Panel, sync: bool = False) -> list[RebeccaNode] | ValueError:
-    for attempt in range(20):
+async def get_token(panel_data: Panel) -> Panel | ValueError:
+    return await tokens.get(panel_data, _login)
+
+
+async def get_rebecca_nodes(panel_data: Panel, sync: bool = False, retry: bool = True) -> list[RebeccaNode] | ValueError:
+    """Nodes of the panel, the panel is tried up to 20 times, or once
+    without `retry`"""
+    attempts = 20 if retry else 1
+    for attempt in range(attempts):
         get_panel_token = await get_token(panel_data)
         if isinstance(get_panel_token, ValueError):
             raise get_panel_token
@@ -58,12 +63,13 @@ async def get_rebecca_nodes(panel_data: Panel, sync: bool = False) -> list[Rebec
             "Authorization": f"Bearer {token}",
         }
         all_nodes = []
-        for scheme in ["https", "http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/nodes"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    response.raise_for_status()
+                response = await client.get(url, headers=headers, timeout=10)
+                response.raise_for_status()
+                client.remember(scheme)
                 user_inform = response.json()
                 for node in [u for u in user_inform if u['status'] == 'connected' and (not sync or u['use_nobetci'])]:
                     all_nodes.append(
@@ -81,58 +87,88 @@ async def get_rebecca_nodes(panel_data: Panel, sync: bool = False) -> list[Rebec
             except SSLError:
                 continue
             except httpx.HTTPStatusError:
-                message = f"[{response.status_code}] {response.text}"
-                await send_notification(message)
-                logger.error(message)
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
+                logger.error(f"[{response.status_code}] {response.text}")
                 continue
             except Exception as error:
-                message = f"An unexpected error occurred: {error}"
-                await send_notification(message)
-                logger.error(message)
-                print(message)
+                logger.error(f"An unexpected error occurred: {error}")
                 continue
-        await asyncio.sleep(random.randint(2, 5) * attempt)
+        if attempt + 1 < attempts:
+            await asyncio.sleep(random.randint(2, 5) * attempt)
     message = (
-        "Failed to get nodes after 20 attempts. make sure the panel is running "
+        f"Failed to get nodes after {attempts} attempts. make sure the panel is running "
         + "and the username and password are correct."
     )
-    await send_notification(message)
+    if retry:
+        await send_notification(message)
     logger.error(message)
     raise ValueError(message)
 
 
-async def get_user(username: str, panel_data: Panel) -> list[RebeccaNode] | ValueError:
-    for attempt in range(20):
-        token = panel_data.token
+async def get_user(username: str, panel_data: Panel) -> dict:
+    for attempt in range(5):
+        token = (await get_token(panel_data)).token
         headers = {
             "Authorization": f"Bearer {token}",
         }
-        for scheme in ["https", "http"]:
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
             url = f"{scheme}://{panel_data.domain}/api/user/{username}"
             try:
-                async with httpx.AsyncClient(verify=False) as client:
-                    response = await client.get(url, headers=headers, timeout=10)
-                    response.raise_for_status()
+                response = await client.get(url, headers=headers, timeout=10)
+                response.raise_for_status()
+                client.remember(scheme)
                 user_inform = response.json()
                 return user_inform
             except SSLError:
                 continue
             except httpx.HTTPStatusError:
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
+                logger.error(f"[{response.status_code}] {response.text}")
+                continue
+            except Exception as error:
+                logger.error(f"Error fetching user {username}: {error}")
+                continue
+        await asyncio.sleep(1)
+    message = f"Failed to get user {username} after 5 attempts."
+    await send_notification(message)
+    logger.error(message)
+    raise ValueError(message)
+
+
+async def get_users_page(panel_data: Panel, offset: int, size: int) -> tuple[list[dict], int]:
+    """One page of the user listing and the total number of users"""
+    for attempt in range(5):
+        token = (await get_token(panel_data)).token
+        headers = {
+            "Authorization": f"Bearer {token}",
+        }
+        client = get_client(panel_data.domain)
+        for scheme in client.schemes():
+            url = f"{scheme}://{panel_data.domain}/api/users"
+            try:
+                response = await client.get(
+                    url, headers=headers, timeout=30,
+                    params={"offset": offset, "limit": size})
+                response.raise_for_status()
+                client.remember(scheme)
+                page = response.json()
+                return page["users"], page["total"]
+            except SSLError:
+                continue
+            except httpx.HTTPStatusError:
+                if response.status_code == 401:
+                    tokens.invalidate(panel_data, token)
                 message = f"[{response.status_code}] {response.text}"
-                await send_notification(message)
                 logger.error(message)
                 continue
             except Exception as error:
-                message = f"An unexpected error occurredd: {error}"
-                await send_notification(message)
-                logger.error(message)
-                print(message)
+                logger.error(f"Error fetching users page at {offset}: {error}")
                 continue
         await asyncio.sleep(random.randint(2, 5) * attempt)
-    message = (
-        "Failed to get user after 20 attempts. make sure the panel is running "
-        + "and the username and password are correct."
-    )
+    message = "Failed to get the user list after 5 attempts."
     await send_notification(message)
     logger.error(message)
     raise ValueError(message)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from jose import jwt
+from jose.exceptions import JOSEError
+
+from app.config import PANEL_TOKEN_REFRESH_MARGIN, PANEL_TOKEN_TTL
+from app.models.panel import Panel
+
+logger = logging.getLogger(__name__)
+
+
+def token_expiry(token: str) -> float | None:
+    """The exp claim of a jwt, the signature isn't checked"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except (JOSEError, AttributeError):
+        return None
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+class TokenManager:
+    """Panel access tokens, one per panel and username.
+
+    A token is reused until `margin` seconds before the exp claim of the
+    jwt (or `ttl` seconds after the login for tokens without one). Callers
+    asking for the same token while it's renewed wait for that one login
+    instead of logging in themselves."""
+
+    def __init__(self, margin: int = PANEL_TOKEN_REFRESH_MARGIN, ttl: int = PANEL_TOKEN_TTL):
+        self.margin = margin
+        self.ttl = ttl
+        # key -> (token, renew at)
+        self._tokens: dict[tuple[str, str], tuple[str, float]] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self.logins = 0
+
+    @staticmethod
+    def _key(panel_data: Panel) -> tuple[str, str]:
+        return panel_data.domain, panel_data.username
+
+    def _valid(self, key) -> str | None:
+        cached = self._tokens.get(key)
+        if cached is None or time.time() >= cached[1]:
+            return None
+        return cached[0]
+
+    async def get(self, panel_data: Panel, login: Callable[[Panel], Awaitable[str]]) -> Panel:
+        """Sets a valid token on panel_data, `login` is called for a new one"""
+        key = self._key(panel_data)
+        token = self._valid(key)
+        if token is None:
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                # renewed by the caller holding the lock before us
+                token = self._valid(key)
+                if token is None:
+                    token = await login(panel_data)
+                    self.logins += 1
+                    expires_at = token_expiry(token)
+                    if expires_at is None:
+                        renew_at = time.time() + self.ttl
+                    else:
+                        renew_at = expires_at - min(self.margin, (expires_at - time.time()) / 2)
+                    self._tokens[key] = (token, renew_at)
+                    logger.debug("new token for %s, renewed in %is",
+                                 panel_data.domain, renew_at - time.time())
+        panel_data.token = token
+        return panel_data
+
+    def invalidate(self, panel_data: Panel, token: str | None = None):
+        """Forgets the token after the panel rejected it. With `token`, only
+        if it's still the current one, a rejection of an older token doesn't
+        throw away the one that replaced it"""
+        key = self._key(panel_data)
+        cached = self._tokens.get(key)
+        if cached is not None and (token is None or cached[0] == token):
+            del self._tokens[key]
+
+
+tokens = TokenManager()
+
+
+def is_auth_error(error: Exception) -> bool:
+    """True when a websocket handshake or request was refused for its token"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in (401, 403)
@@ -1,47 +1,64 @@
 import re
 
-from app.models.user import User, UserStatus
-
-
-IP_V6_REGEX = re.compile(r"\[([0-9a-fA-F:]+)\]:\d+\s+accepted")
-IP_V4_REGEX = re.compile(r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})")
-EMAIL_REGEX = re.compile(r"email:\s*([A-Za-z0-9._%+-]+)")
-INBOUND_REGEX = re.compile(r"\[(.*?)\s(?:->|>>)")
-ACCEPTED_REGEX = re.compile(r"accepted\s+(\S+)")
-
-
-def parse_log_to_user(log) -> str:
-    try:
-        ip_v6_match = IP_V6_REGEX.search(log)
-        ip_v4_match = IP_V4_REGEX.search(log)
-        email_match = EMAIL_REGEX.search(log)
-        inbound_match = INBOUND_REGEX.search(log)
-        accepted_match = ACCEPTED_REGEX.search(log)
-
-        if ip_v6_match:
-            ip = ip_v6_match.group(1)
-        elif ip_v4_match:
-            ip = ip_v4_match.group(1)
-
-        if email_match:
-            email = email_match.group(1)
-            email = re.sub(r"^\d+\.", "", email)
-
-        if inbound_match:
-            inbound = inbound_match.group(1)
-
-        if accepted_match:
-            accepted = accepted_match.group(1)
-
-        if email:
-            return User(
-                name=email,
-                ip=ip,
-                inbound=inbound,
-                accepted=accepted,
-                status=UserStatus.ACTIVE,
-                count=0
-            )
+from app.models.user import ConnectionEvent
+
+
+# source ip (v6, v4 or v4 mapped v6), destination, inbound and email in one pass,
+# the numeric "<id>." prefix of the email is skipped
+LOG_REGEX = re.compile(
+    r"(?:\[(?P<ipv6>[0-9a-fA-F:]+)\]|\[?(?:::ffff:)?(?P<ipv4>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\]?)"
+    r":\d+\s+accepted\s+(?P<accepted>\S+)"
+    r"\s+\[(?P<inbound>[^\]]*?)\s(?:->|>>)"
+    r".*?email:\s*(?:\d+\.)?(?P<email>[A-Za-z0-9._%+-]+)"
+)
+
+
+def _parse_row(log: str) -> tuple[str, str, str, str] | None:
+    if "accepted" not in log or "email:" not in log:
         return None
-    except:
+
+    match = LOG_REGEX.search(log)
+    if not match:
         return None
+    return (match.group("email"), match.group("ipv6") or match.group("ipv4"),
+            match.group("inbound"), match.group("accepted"))
+
+
+def row_to_event(row: tuple[str, str, str, str], node: str | None = None) -> ConnectionEvent:
+    name, ip, inbound, accepted = row
+    return ConnectionEvent(name, ip, inbound, accepted, node)
+
+
+def parse_log_to_event(log: str, node: str | None = None) -> ConnectionEvent | None:
+    row = _parse_row(log)
+    return row_to_event(row, node) if row else None
+
+
+def parse_logs_to_rows(logs: str) -> list[tuple[str, str, str, str]]:
+    """Parses a multi-line log frame to compact (name, ip, inbound, accepted)
+    tuples, cheap to send between processes. Lines without a user are skipped"""
+    return [row for row in map(_parse_row, logs.split('\n')) if row]
+
+
+def parse_logs_to_batch(logs: str) -> tuple[list[tuple[str, str, str, str]], list[int]]:
+    """Parses a multi-line log frame to rows deduplicated by (name, ip),
+    in the order they were first seen, and how many lines each one had"""
+    rows = []
+    hits = []
+    seen: dict[tuple[str, str], int] = {}
+    for row in map(_parse_row, logs.split('\n')):
+        if row is None:
+            continue
+        index = seen.get(row[:2])
+        if index is None:
+            seen[row[:2]] = len(rows)
+            rows.append(row)
+            hits.append(1)
+        else:
+            hits[index] += 1
+    return rows, hits
+
+
+def parse_logs_to_events(logs: str, node: str | None = None) -> list[ConnectionEvent]:
+    """Parses a multi-line log frame, lines without a user are skipped"""
+    return [row_to_event(row, node) for row in parse_logs_to_rows(logs)]
@@ -0,0 +1,12 @@
+"""Micro-benchmarks, run from the repository root, e.g.
+`python -m benchmarks.storage`. They only time code in this process (and
+the parser processes), no server or database is needed"""
+
+import base64
+from unittest import mock
+
+# app.notification fetches the ad from github when it's imported
+_ad = mock.Mock()
+_ad.json.return_value = {"content": base64.b64encode(b"").decode()}
+with mock.patch("requests.get", return_value=_ad):
+    import app.notification  # noqa: E402,F401
@@ -0,0 +1,73 @@
+"""ConnectionEvent against the pydantic User the parser used to build:
+construction time, memory per ip tracked by IndexedMemoryStorage and
+the time a 400 line frame takes to be parsed and tracked"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.models.user import ConnectionEvent, User, UserStatus
+from app.storage.indexed import IndexedMemoryStorage
+from app.utils.parser import parse_logs_to_rows, row_to_event
+
+from .logs import frames, log_lines
+
+
+def row_to_user(row: tuple[str, str, str, str], node: str | None = None) -> User:
+    """How the parser built users before ConnectionEvent"""
+    name, ip, inbound, accepted = row
+    return User(name=name, ip=ip, inbound=inbound, accepted=accepted, node=node,
+                status=UserStatus.ACTIVE, count=0)
+
+
+def construction(rows: list, build) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        build(row, "node")
+    return (time.perf_counter() - started) / len(rows) * 10 ** 9
+
+
+def tracked_bytes(rows: list, build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    storage = IndexedMemoryStorage()
+    for row in rows:
+        storage.add_user(build(row, "node"))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / sum(len(ips) for ips in storage.storage.values())
+
+
+def frame_ms(joined: list[str], build, track: bool) -> float:
+    storage = IndexedMemoryStorage()
+    started = time.perf_counter()
+    for frame in joined:
+        users = [build(row, "node") for row in parse_logs_to_rows(frame)]
+        if track:
+            for user in users:
+                storage.add_user(user)
+    return (time.perf_counter() - started) / len(joined) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--frame", type=int, default=400, help="lines per frame")
+    args = parser.parse_args()
+
+    rows = [(f"user_{index}", f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+             "VLESS TCP REALITY", f"tcp:www.site{index % 1000}.com:443")
+            for index in range(args.rows)]
+    joined = frames(log_lines(args.rows), args.frame)
+
+    print(f"{args.rows} rows, {args.frame} line frames")
+    for label, build in (("User", row_to_user), ("ConnectionEvent", row_to_event)):
+        print(f"  {label:<16} {construction(rows, build):>7.0f} ns per event, "
+              + f"{tracked_bytes(rows, build):>6.0f} bytes per tracked ip, "
+              + f"frame {frame_ms(joined, build, False):.1f} ms parsed, "
+              + f"{frame_ms(joined, build, True):.1f} ms parsed and tracked")
+
+
+if __name__ == "__main__":
+    main()
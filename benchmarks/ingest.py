@@ -0,0 +1,72 @@
+"""IngestService with frames parsed inline against parsed in the
+PARSER_PROCESSES pool, with a check service that only counts.
+
+Reports wall clock throughput and the CPU time the main process spends
+per line, which is what the pool takes off the event loop. On a single
+core the wall clock can't improve"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.service import ingest_service
+from app.service.ingest_service import IngestService
+
+from .logs import frames, log_lines
+
+
+class CountingCheck:
+    def __init__(self):
+        self.users = 0
+
+    async def check_many(self, users, hits=None):
+        self.users += len(users)
+
+
+async def run(joined: list[str], processes: int) -> tuple[float, float, int]:
+    pool = None
+    if processes:
+        pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        # start the workers before timing
+        list(pool.map(abs, range(processes)))
+    ingest_service._parser_pool = pool
+
+    check = CountingCheck()
+    service = IngestService(check, queue_size=len(joined), overflow="block")
+    service._parsing = asyncio.Semaphore(max(processes, 1) * 4)
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    for frame in joined:
+        await service.put_frame(frame, "node")
+    while service._parsers:
+        await asyncio.gather(*service._parsers)
+    await service._queue.join()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    await service.stop()
+    if pool is not None:
+        pool.shutdown()
+    ingest_service._parser_pool = None
+    return wall, cpu, check.users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--frame", type=int, default=200, help="lines per frame")
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    joined = frames(log_lines(args.lines), args.frame)
+    print(f"{args.lines} lines in {args.frame} line frames, {multiprocessing.cpu_count()} cpus")
+    for processes in (0, args.processes):
+        wall, cpu, users = asyncio.run(run(joined, processes))
+        label = f"{processes} processes" if processes else "inline"
+        print(f"  {label:<12} {args.lines / wall:>10,.0f} lines/s, "
+              + f"main process {cpu / args.lines * 10 ** 6:.1f} us/line ({users} users checked)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Synthetic Xray access log lines, there's no recorded corpus in the repo"""
+
+import random
+
+
+def log_lines(count: int, users: int = 20000, accepted: float = 0.3,
+              seed: int = 0) -> list[str]:
+    """`count` lines, `accepted` of them accepted connections with an
+    email (a tenth from v6 sources), the rest info, dns and rejected noise"""
+    rnd = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        time = f"2025/06/01 12:{rnd.randrange(60):02}:{rnd.randrange(60):02}.{rnd.randrange(10 ** 6):06}"
+        kind = rnd.random()
+        if kind < accepted:
+            user = rnd.randrange(users)
+            if rnd.random() < 0.1:
+                source = f"[2001:db8::{user % 65536:x}:{rnd.randrange(16):x}]"
+            else:
+                source = f"10.{user // 256 % 256}.{user % 256}.{rnd.randrange(1, 4)}"
+            lines.append(
+                f"{time} from {source}:{rnd.randrange(1024, 65536)} accepted "
+                + f"tcp:www.site{rnd.randrange(1000)}.com:443 [VLESS TCP REALITY >> DIRECT] "
+                + f"email: {user}.user_{user}")
+        elif kind < accepted + 0.3:
+            lines.append(f"{time} [Info] [{rnd.randrange(10 ** 9)}] proxy/vless/inbound: "
+                         + "firstLen = 517")
+        elif kind < accepted + 0.5:
+            lines.append(f"{time} [Info] app/dns: UDP:1.1.1.1:53 got answer: "
+                         + f"www.site{rnd.randrange(1000)}.com. TypeA -> [1.2.3.4] 12ms")
+        else:
+            lines.append(f"{time} from 10.0.{rnd.randrange(256)}.{rnd.randrange(256)}:"
+                         + f"{rnd.randrange(1024, 65536)} rejected  proxy/vless/encoding: "
+                         + "invalid request user id")
+    return lines
+
+
+def frames(lines: list[str], size: int) -> list[str]:
+    """The lines joined into websocket frames of `size` lines"""
+    return ['\n'.join(lines[index:index + size]) for index in range(0, len(lines), size)]
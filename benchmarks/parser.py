@@ -0,0 +1,90 @@
+"""The single pass log parser against the one it replaced, which ran five
+searches and a re.sub on every line and built a pydantic User.
+
+Also checks that both parse the same fields from the lines, bracketed v6
+sources aside (the old parser read their inbound from the ip bracket)"""
+
+import argparse
+import re
+import time
+
+from app.models.user import User, UserStatus
+from app.utils.parser import parse_log_to_event, parse_logs_to_events
+
+from .logs import frames, log_lines
+
+IP_V6_REGEX = re.compile(r"\[([0-9a-fA-F:]+)\]:\d+\s+accepted")
+IP_V4_REGEX = re.compile(r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})")
+EMAIL_REGEX = re.compile(r"email:\s*([A-Za-z0-9._%+-]+)")
+INBOUND_REGEX = re.compile(r"\[(.*?)\s(?:->|>>)")
+ACCEPTED_REGEX = re.compile(r"accepted\s+(\S+)")
+
+
+def legacy_parse_log_to_user(log) -> User | None:
+    """The parser before the single pass regex, as it was"""
+    try:
+        ip_v6_match = IP_V6_REGEX.search(log)
+        ip_v4_match = IP_V4_REGEX.search(log)
+        email_match = EMAIL_REGEX.search(log)
+        inbound_match = INBOUND_REGEX.search(log)
+        accepted_match = ACCEPTED_REGEX.search(log)
+
+        if ip_v6_match:
+            ip = ip_v6_match.group(1)
+        elif ip_v4_match:
+            ip = ip_v4_match.group(1)
+
+        if email_match:
+            email = email_match.group(1)
+            email = re.sub(r"^\d+\.", "", email)
+
+        if inbound_match:
+            inbound = inbound_match.group(1)
+
+        if accepted_match:
+            accepted = accepted_match.group(1)
+
+        if email:
+            return User(name=email, ip=ip, inbound=inbound, accepted=accepted,
+                        status=UserStatus.ACTIVE, count=0)
+        return None
+    except:
+        return None
+
+
+def rate(count: int, parse) -> float:
+    started = time.perf_counter()
+    parse()
+    return count / (time.perf_counter() - started)
+
+
+def differences(lines: list[str]) -> int:
+    different = 0
+    for line in lines:
+        old, new = legacy_parse_log_to_user(line), parse_log_to_event(line)
+        if old is None or new is None:
+            different += (old is None) != (new is None)
+            continue
+        fields = ["name", "ip", "accepted"] + ([] if ":" in new.ip else ["inbound"])
+        different += any(getattr(old, field) != getattr(new, field) for field in fields)
+    return different
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--frame", type=int, default=50, help="lines per frame")
+    args = parser.parse_args()
+
+    lines = log_lines(args.lines)
+    joined = frames(lines, args.frame)
+
+    print(f"{args.lines} lines, {differences(lines)} parsed differently")
+    print(f"  old parse_log_to_user  {rate(len(lines), lambda: [legacy_parse_log_to_user(line) for line in lines]):>12,.0f} lines/s")
+    print(f"  parse_log_to_event     {rate(len(lines), lambda: [parse_log_to_event(line) for line in lines]):>12,.0f} lines/s")
+    print(f"  parse_logs_to_events   {rate(len(lines), lambda: [parse_logs_to_events(frame) for frame in joined]):>12,.0f} lines/s"
+          + f" ({args.frame} line frames)")
+
+
+if __name__ == "__main__":
+    main()
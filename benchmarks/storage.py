@@ -0,0 +1,53 @@
+"""MemoryStorage (one list of every tracked ip) against IndexedMemoryStorage.
+
+Every line does add_user + get_users + get_user + get_last_user, like
+CheckService.check does for a line, on a storage already tracking
+`users` users with `ips` ips each"""
+
+import argparse
+import random
+import time
+
+from app.models.user import ConnectionEvent
+from app.storage.base import BaseStorage
+from app.storage.indexed import IndexedMemoryStorage
+from app.storage.memory import MemoryStorage
+
+
+def fill(storage: BaseStorage, users: int, ips: int) -> BaseStorage:
+    for user in range(users):
+        for ip in range(ips):
+            storage.add_user(ConnectionEvent(f"user_{user}", f"10.0.{ip}.{user % 256}"))
+    return storage
+
+
+def run(storage: BaseStorage, lines: list[ConnectionEvent]) -> float:
+    started = time.perf_counter()
+    for line in lines:
+        storage.add_user(line)
+        storage.get_users(line.name)
+        storage.get_user(line.name)
+        storage.get_last_user(line.name)
+    return len(lines) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--ips", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=5000)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    lines = [ConnectionEvent(f"user_{rnd.randrange(args.users)}",
+                             f"10.0.{rnd.randrange(args.ips + 1)}.{rnd.randrange(256)}")
+             for _ in range(args.lines)]
+
+    print(f"{args.users} users x {args.ips} ips, {args.lines} lines")
+    for storage in (MemoryStorage, IndexedMemoryStorage):
+        rate = run(fill(storage(), args.users, args.ips), lines)
+        print(f"  {storage.__name__:<22} {rate:>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import ipaddress
 from typing import Optional
 import typer
 
@@ -6,7 +7,9 @@ from rich.table import Table
 from app.db.models import ExceptedIP
 
 from . import utils
-from app.db import excepted_ips
+from app.db.db_context import DbContext
+
+excepted_ips = DbContext(ExceptedIP)
 
 
 app = typer.Typer(no_args_is_help=True)
@@ -38,6 +41,10 @@ def list_excepted_ips(
 
 @app.command(name="add")
 def add(ip: str = typer.Option(None, *utils.FLAGS["ip"], prompt=True)):
+    try:
+        ipaddress.ip_network(ip, strict=False)
+    except ValueError:
+        utils.error(f'{ip} is not an ip or cidr range.')
     if excepted_ips.get(ExceptedIP.ip == ip):
         utils.error(f'{ip} is excepted.')
     excepted_ips.add({"ip": ip})
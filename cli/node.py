@@ -6,7 +6,10 @@ from rich.table import Table
 from app.db.models import Node
 
 from . import utils
-from app.db import node_db, tls_db
+from app.db import tls_db
+from app.db.db_context import DbContext
+
+node_db = DbContext(Node)
 
 
 app = typer.Typer(no_args_is_help=True)
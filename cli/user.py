@@ -1,14 +1,44 @@
 from typing import List, Optional
+from urllib.parse import quote
+
+import httpx
 import typer
 
 from rich.table import Table
 
+from app.config import (API_USERNAME, DEBUG, LIMIT_CACHE_TTL, UVICORN_PORT,
+                        UVICORN_SSL_CERTFILE, UVICORN_UDS)
 from app.db.models import UserLimit
 from app.models.user import User
 from app.nobetnode import nodes
+from app.utils.auth import create_access_token
 
 from . import utils
-from app import user_limit_db
+from app.db.db_context import DbContext
+
+user_limit_db = DbContext(UserLimit)
+
+
+def invalidate_limit_cache(name: str):
+    """Tells the running service to drop its cached limit of `name`,
+    otherwise the change shows up once the cached entry expires"""
+    later = f"the running service picks up the change within {LIMIT_CACHE_TTL} seconds"
+    if not API_USERNAME:
+        utils.warning(f"API_USERNAME isn't set, {later}.")
+        return
+    if UVICORN_UDS and not DEBUG:
+        transport, url = httpx.HTTPTransport(uds=UVICORN_UDS), "http://nobetci"
+    else:
+        scheme = "https" if UVICORN_SSL_CERTFILE else "http"
+        transport, url = None, f"{scheme}://127.0.0.1:{UVICORN_PORT}"
+    try:
+        with httpx.Client(transport=transport, verify=False, timeout=5) as client:
+            response = client.delete(
+                f"{url}/api/users/cache/{quote(name, safe='')}",
+                headers={"Authorization": f"Bearer {create_access_token(API_USERNAME, True)}"})
+            response.raise_for_status()
+    except httpx.HTTPError as err:
+        utils.warning(f"Couldn't reach the running service ({err}), {later}.")
 
 
 app = typer.Typer(no_args_is_help=True)
@@ -46,12 +76,14 @@ def add(name: str = typer.Option(None, *utils.FLAGS["name"], prompt=True),
     if user_limit_db.get(UserLimit.name == name):
         utils.error(f'User {name} exists.')
     user_limit_db.add({"name": name, "limit": limit})
+    invalidate_limit_cache(name)
     utils.success(f'{name}\'s limit successfully set to "{limit}".')
 
 
 @app.command(name="delete")
 def delete(name: str = typer.Option(None, *utils.FLAGS["name"], prompt=True)):
     user_limit_db.delete(UserLimit.name == name)
+    invalidate_limit_cache(name)
     utils.success(f'{name}\'s limit successfully deleted.')
 
 
@@ -61,6 +93,7 @@ def update(name: str = typer.Option(None, *utils.FLAGS["name"], prompt=True),
     if not user_limit_db.get(UserLimit.name == name):
         utils.error(f'User {name} isn\'t exists.')
     user_limit_db.update(UserLimit.name == name, {"limit": limit})
+    invalidate_limit_cache(name)
     utils.success(f'{name}\'s limit successfully set to "{limit}".')
 
 
@@ -35,6 +35,10 @@ def success(text: str, auto_exit: bool = True):
         raise typer.Exit(0)
 
 
+def warning(text: str):
+    typer.echo(typer.style(text, fg=typer.colors.YELLOW), err=True)
+
+
 def error(text: str, auto_exit: bool = True):
     typer.echo(typer.style(text, fg=typer.colors.RED), err=True)
     if auto_exit:
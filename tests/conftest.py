@@ -0,0 +1,39 @@
+"""Settings for the tests, applied before the app is imported"""
+
+import base64
+import os
+import tempfile
+from unittest import mock
+
+import pytest
+
+os.environ.update({
+    "SQLALCHEMY_DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/nobetci.sqlite3",
+    "SQLALCHEMY_ASYNC": "False",
+    "STORAGE_TYPE": "indexed",
+    "STORAGE_WINDOW": "0",
+    "CHECK_SHARDS": "0",
+    "LIMIT_PRELOAD": "False",
+    "SYNC_WITH_PANEL": "False",
+    "TELEGRAM_API_TOKEN": "",
+    "STL": "10",
+    "IUL": "50",
+    "REPEAT_DECAY": "600",
+    "BAN_LAST_USER": "False",
+})
+
+# app.notification fetches the ad from github when it's imported
+_ad = mock.Mock()
+_ad.json.return_value = {"content": base64.b64encode(b"").decode()}
+with mock.patch("requests.get", return_value=_ad):
+    import app.notification  # noqa: E402,F401
+
+from app.db.base import Base, engine  # noqa: E402
+
+Base.metadata.create_all(engine)
+
+
+@pytest.fixture(scope="session")
+def certificate():
+    from app.utils.crypto import generate_certificate
+    return generate_certificate()
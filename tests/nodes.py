@@ -0,0 +1,54 @@
+"""Nodes without a connection, driven by the tests, answering with a
+fake stub"""
+
+import asyncio
+
+from app.models.node import Node
+from app.models.user import User
+from app.nobetnode.grpclib import NobetNodeGRPCLIB
+from app.nobetnode.nobetnode_pb2 import Result, Results
+
+
+class FakeStub:
+    """Answers the batch calls, the node is told the stream is missing"""
+
+    def __init__(self):
+        self.calls: list[tuple[str, list[str]]] = []
+
+    async def BanUsers(self, request):
+        return self._answer("ban", request)
+
+    async def UnBanUsers(self, request):
+        return self._answer("unban", request)
+
+    def _answer(self, kind: str, request) -> Results:
+        self.calls.append((kind, [user.ip for user in request.users]))
+        return Results(results=[Result(success=True, message="ok") for _ in request.users])
+
+
+def disconnected_node(certificate, node_id: int = 1) -> tuple[NobetNodeGRPCLIB, FakeStub]:
+    node = NobetNodeGRPCLIB(
+        Node(id=node_id, name=f"node-{node_id}", address="127.0.0.1", port=9, status="healthy"),
+        certificate["key"], certificate["cert"])
+    # connection state is driven by the test
+    node._monitor_task.cancel()
+    node._stub = stub = FakeStub()
+    node.stream_supported = False
+    return node, stub
+
+
+def connect(node: NobetNodeGRPCLIB):
+    node.synced = True
+    node._connected.set()
+
+
+async def drained(node: NobetNodeGRPCLIB):
+    for _ in range(100):
+        if not node._outbox:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+
+
+def ban(ip: str) -> User:
+    return User(name="user", status=None, ip=ip, count=0)
@@ -0,0 +1,107 @@
+"""BanRegistry over nodes that are up and nodes that are down"""
+
+import asyncio
+
+import pytest
+
+from app import nobetnode
+from app.service.ban_registry import BanRegistry
+
+from .nodes import ban, connect, disconnected_node, drained
+
+
+@pytest.fixture
+def nodes(monkeypatch):
+    monkeypatch.setattr(nobetnode, "nodes", {})
+    return nobetnode.nodes
+
+
+async def saved(registry: BanRegistry):
+    await asyncio.sleep(0)
+    await asyncio.gather(*registry._saving)
+
+
+def test_ban_on_nodes_that_are_up(nodes, certificate):
+    async def run():
+        registry = BanRegistry()
+        stubs = []
+        for node_id in (1, 2):
+            nodes[node_id], stub = disconnected_node(certificate, node_id)
+            connect(nodes[node_id])
+            stubs.append(stub)
+
+        await registry.ban([ban("1.1.1.1")], 60)
+        assert registry.get("1.1.1.1").nodes == [1, 2]
+        assert registry.covers("1.1.1.1")
+
+        await registry.ban([ban("1.1.1.1")], 60)
+        assert registry.suppressed == 1
+        assert [stub.calls for stub in stubs] == [[("ban", ["1.1.1.1"])]] * 2
+        for node in nodes.values():
+            await node.stop()
+
+    asyncio.run(run())
+
+
+def test_ban_on_a_node_that_is_down(nodes, certificate):
+    async def run():
+        registry = BanRegistry()
+        nodes[1], up = disconnected_node(certificate, 1)
+        connect(nodes[1])
+        nodes[2], down = disconnected_node(certificate, 2)
+
+        results = await registry.ban([ban("1.1.1.1")], 60)
+        assert not results[2]["success"]
+        entry = registry.get("1.1.1.1")
+        assert (entry.nodes, entry.pending) == ([1], [2])
+        # queued counts as covered, the same ban isn't queued again
+        assert registry.covers("1.1.1.1")
+
+        await registry.ban([ban("1.1.1.1")], 60)
+        assert registry.suppressed == 1
+        assert len(nodes[2]._outbox) == 1
+
+        connect(nodes[2])
+        await drained(nodes[2])
+        await saved(registry)
+
+        assert up.calls == down.calls == [("ban", ["1.1.1.1"])]
+        assert list(registry.bans) == ["1.1.1.1"]
+        entry = registry.get("1.1.1.1")
+        assert (entry.nodes, entry.pending) == ([1, 2], [])
+        assert registry.covers("1.1.1.1")
+        for node in nodes.values():
+            await node.stop()
+
+    asyncio.run(run())
+
+
+def test_dropped_ban_is_sent_again(nodes, certificate):
+    async def run():
+        registry = BanRegistry()
+        nodes[1], _ = disconnected_node(certificate, 1)
+
+        await registry.ban([ban("1.1.1.1")], 60)
+        assert registry.get("1.1.1.1").pending == [1]
+
+        await nodes[1].stop()
+        await saved(registry)
+        entry = registry.get("1.1.1.1")
+        assert (entry.nodes, entry.pending) == ([], [])
+        assert not registry.covers("1.1.1.1")
+
+    asyncio.run(run())
+
+
+def test_bad_duration_sends_nothing(nodes, certificate):
+    async def run():
+        registry = BanRegistry()
+        nodes[1], stub = disconnected_node(certificate, 1)
+        connect(nodes[1])
+
+        with pytest.raises(ValueError):
+            await registry.ban([ban("1.1.1.1")], "soon")
+        assert stub.calls == [] and registry.get("1.1.1.1") is None
+        await nodes[1].stop()
+
+    asyncio.run(run())
@@ -0,0 +1,211 @@
+"""The STL/IUL decisions of CheckService.decide, replayed over fixed line
+sequences, the RepeatCounter behind them (STL=10, IUL=50) and the gate
+in front of them"""
+
+import asyncio
+
+import pytest
+
+from app.models.user import ConnectionEvent, UserLimit
+from app.service import check_service
+from app.service.check_service import CheckService
+from app.storage import windowed
+from app.storage.indexed import IndexedMemoryStorage
+from app.storage.windowed import WindowedMemoryStorage
+from app.utils import counter, gate
+from app.utils.counter import RepeatCounter
+
+
+@pytest.fixture
+def service():
+    return CheckService(IndexedMemoryStorage(), None)
+
+
+def replay(service: CheckService, ips: list[str], limit: int = 1, name: str = "user"):
+    return [service.decide(ConnectionEvent(name, ip), limit) for ip in ips]
+
+
+def test_within_limit(service):
+    assert replay(service, ["1.1.1.1"] * 100) == [None] * 100
+    assert replay(service, ["1.1.1.1", "2.2.2.2"] * 50, limit=2, name="other") == [None] * 100
+
+
+def test_unlimited_user_is_checked_by_the_caller(service):
+    # a limit of 0 is skipped before decide, decide itself counts every ip
+    assert replay(service, ["1.1.1.1"], limit=0) == [False]
+
+
+def test_ban_once_both_ips_reach_stl(service):
+    decisions = replay(service, ["1.1.1.1"] + ["2.2.2.2", "1.1.1.1"] * 10)
+
+    assert decisions[:-1] == [None] + [False] * 19
+    user_to_ban, first_user = decisions[-1]
+    assert user_to_ban is first_user
+    assert first_user.ip == "1.1.1.1"
+
+    # the first ip is forgotten and the counters reset
+    assert [user.ip for user in service._storage.get_users("user")] == ["2.2.2.2"]
+    assert len(service.repeated_out_of_limits) == 0
+    assert replay(service, ["2.2.2.2"]) == [None]
+
+
+def test_no_ban_below_stl(service):
+    decisions = replay(service, ["1.1.1.1"] + ["2.2.2.2", "1.1.1.1"] * 9 + ["2.2.2.2"] * 40)
+
+    assert decisions == [None] + [False] * 58
+    assert service.repeated_out_of_limits.get("user", "1.1.1.1") == 9
+    assert service.repeated_out_of_limits.get("user", "2.2.2.2") == 49
+
+
+def test_reset_when_counts_drift_past_iul(service):
+    decisions = replay(service, ["1.1.1.1"] + ["2.2.2.2"] * 51)
+
+    # the 51st line of the second ip puts it IUL past the first one
+    assert decisions == [None] + [False] * 51
+    assert [user.ip for user in service._storage.get_users("user")] == ["2.2.2.2"]
+    assert len(service.repeated_out_of_limits) == 0
+    assert replay(service, ["2.2.2.2"]) == [None]
+
+
+def test_no_reset_at_iul(service):
+    replay(service, ["1.1.1.1"] + ["2.2.2.2"] * 50)
+
+    assert len(service._storage.get_users("user")) == 2
+    assert service.repeated_out_of_limits.get("user", "2.2.2.2") == 50
+
+
+def test_ban_with_more_ips_than_limit(service):
+    ips = ["1.1.1.1", "2.2.2.2"] + ["3.3.3.3", "1.1.1.1"] * 10
+    decisions = replay(service, ips, limit=2)
+
+    assert decisions[:-1] == [None, None] + [False] * 19
+    user_to_ban, first_user = decisions[-1]
+    assert user_to_ban.ip == first_user.ip == "1.1.1.1"
+
+
+def test_hits_count_as_lines(service):
+    assert service.decide(ConnectionEvent("user", "1.1.1.1"), 1) is None
+    assert service.decide(ConnectionEvent("user", "2.2.2.2"), 1, hits=10) is False
+    user_to_ban, _ = service.decide(ConnectionEvent("user", "1.1.1.1"), 1, hits=10)
+    assert user_to_ban.ip == "1.1.1.1"
+
+
+def test_ban_last_user(service, monkeypatch):
+    monkeypatch.setattr(check_service, "BAN_LAST_USER", True)
+    decisions = replay(service, ["1.1.1.1"] + ["2.2.2.2", "1.1.1.1"] * 10)
+
+    user_to_ban, first_user = decisions[-1]
+    assert (user_to_ban.ip, first_user.ip) == ("2.2.2.2", "1.1.1.1")
+
+
+def test_users_are_counted_apart(service):
+    lines = ["1.1.1.1"] + ["2.2.2.2", "1.1.1.1"] * 10
+    user_decisions = replay(service, lines)
+    other_decisions = replay(service, lines[:-1], name="other")
+
+    assert user_decisions[-1] is not False
+    assert other_decisions == [None] + [False] * 19
+    assert service.repeated_out_of_limits.get("other", "1.1.1.1") == 9
+    assert service.repeated_out_of_limits.get("other", "2.2.2.2") == 10
+    assert service.repeated_out_of_limits.get("user", "2.2.2.2") == 0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(counter.time, "monotonic", clock)
+    return clock
+
+
+def test_counter_increment_get_reset(clock):
+    counts = RepeatCounter()
+    assert counts.increment("user", "1.1.1.1") == 1
+    assert counts.increment("user", "1.1.1.1", 4) == 5
+    counts.increment("user", "2.2.2.2")
+    counts.increment("other", "1.1.1.1")
+
+    assert counts.get("user", "1.1.1.1") == 5
+    assert counts.get("user", "3.3.3.3") == 0
+    assert len(counts) == 3
+
+    counts.reset("user")
+    assert counts.get("user", "1.1.1.1") == 0
+    assert counts.get("other", "1.1.1.1") == 1
+    assert len(counts) == 1
+
+
+def test_counter_decay(clock):
+    counts = RepeatCounter(decay=600)
+    counts.increment("user", "1.1.1.1", 5)
+
+    clock.now += 600
+    assert counts.get("user", "1.1.1.1") == 5
+
+    clock.now += 1
+    assert counts.get("user", "1.1.1.1") == 0
+    # a stale count starts over
+    assert counts.increment("user", "1.1.1.1") == 1
+
+
+def test_counter_decay_is_per_ip(clock):
+    counts = RepeatCounter(decay=600)
+    counts.increment("user", "1.1.1.1")
+    clock.now += 400
+    counts.increment("user", "2.2.2.2")
+    clock.now += 400
+
+    assert counts.get("user", "1.1.1.1") == 0
+    assert counts.get("user", "2.2.2.2") == 1
+
+
+def test_counter_prunes_stale_counts(clock):
+    counts = RepeatCounter(decay=600)
+    counts.increment("user", "1.1.1.1")
+    counts.increment("other", "1.1.1.1")
+    clock.now += 700
+    counts.increment("other", "2.2.2.2")
+
+    # the increment pruned the stale counts, names without any are gone
+    assert len(counts) == 1
+    assert "user" not in counts._counts
+
+
+def test_counter_without_decay_keeps_counts(clock):
+    counts = RepeatCounter()
+    counts.increment("user", "1.1.1.1")
+    clock.now += 10 ** 9
+    counts.prune()
+
+    assert counts.get("user", "1.1.1.1") == 1
+
+
+def test_gated_ips_stay_in_a_windowed_storage(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(gate.time, "monotonic", clock)
+    monkeypatch.setattr(windowed.time, "monotonic", clock)
+    monkeypatch.setattr(check_service, "STORAGE_WINDOW", 10)
+
+    class Limits:
+        def get(self, condition):
+            return UserLimit(name="user", limit=1)
+
+    service = CheckService(WindowedMemoryStorage(10), Limits())
+
+    async def run():
+        # an ip logging every second for longer than the window
+        for _ in range(30):
+            await service.check(ConnectionEvent("user", "1.1.1.1"))
+            clock.now += 1
+            assert [user.ip for user in service._storage.get_users("user")] == ["1.1.1.1"]
+
+    asyncio.run(run())
+    assert service.gate.interval == 5
+    assert service.gate.skipped > 0
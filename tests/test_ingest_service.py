@@ -0,0 +1,33 @@
+"""The INGEST_OVERFLOW policies of IngestService with a full queue"""
+
+import asyncio
+
+import pytest
+
+from app.models.user import ConnectionEvent
+from app.service.ingest_service import IngestService
+
+
+def full_queue(overflow: str) -> IngestService:
+    ingest = IngestService(None, queue_size=1, workers=0, overflow=overflow)
+    ingest._queue.put_nowait(([ConnectionEvent("user", "1.1.1.1")], [1]))
+    return ingest
+
+
+def queued(ingest: IngestService) -> list[str]:
+    return [users[0].ip for users, _ in ingest._queue._queue]
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError, match="block, drop_new, drop_old"):
+        IngestService(None, overflow="drop")
+
+
+def test_drop_policies():
+    async def run():
+        for overflow, kept in (("drop_new", "1.1.1.1"), ("drop_old", "2.2.2.2")):
+            ingest = full_queue(overflow)
+            await ingest.put(ConnectionEvent("user", "2.2.2.2"))
+            assert (queued(ingest), ingest.dropped) == ([kept], 1)
+
+    asyncio.run(run())
@@ -0,0 +1,80 @@
+"""LimitCache in front of a db, and the route the CLI calls after it
+changed a limit in the database"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.db_base import DBBase
+from app.db.limit_cache import LimitCache
+from app.db.models import UserLimit as DbUserLimit
+from app.deps import sudo_admin
+from app.models.user import UserLimit
+from app.routes import user as user_routes
+
+
+class Db(DBBase):
+    """Limits changed behind the cache's back, like the CLI does"""
+
+    def __init__(self):
+        self.limits: dict[str, int] = {}
+        self.reads = 0
+
+    def get(self, condition):
+        self.reads += 1
+        name = condition.right.value
+        return UserLimit(name=name, limit=self.limits[name]) if name in self.limits else None
+
+    def save(self):
+        pass
+
+    def add(self, data):
+        pass
+
+    def delete(self, condition):
+        pass
+
+    def update(self, condition, data):
+        pass
+
+    def get_all(self, condition):
+        return []
+
+
+def limit(cache: LimitCache, name: str):
+    user_limit = cache.get(DbUserLimit.name == name)
+    return user_limit and user_limit.limit
+
+
+def test_invalidate():
+    db = Db()
+    cache = LimitCache(db)
+    db.limits["user"] = 1
+    assert limit(cache, "user") == 1
+    assert limit(cache, "other") is None
+
+    db.limits.update(user=2, other=3)
+    assert (limit(cache, "user"), limit(cache, "other")) == (1, None)
+    assert db.reads == 2
+
+    cache.invalidate("user")
+    assert (limit(cache, "user"), limit(cache, "other")) == (2, None)
+    cache.invalidate()
+    assert limit(cache, "other") == 3
+    assert db.reads == 4
+
+
+def test_invalidate_route(monkeypatch):
+    db = Db()
+    cache = LimitCache(db)
+    monkeypatch.setattr(user_routes, "user_limit_db", cache)
+    app = FastAPI()
+    app.include_router(user_routes.router, prefix="/api")
+    app.dependency_overrides[sudo_admin] = lambda: None
+
+    db.limits["user"] = 1
+    limit(cache, "user")
+    db.limits["user"] = 2
+
+    response = TestClient(app).delete("/api/users/cache/user")
+    assert response.json() == {"success": True}
+    assert limit(cache, "user") == 2
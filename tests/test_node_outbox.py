@@ -0,0 +1,54 @@
+"""Requests to a node that isn't connected wait in its outbox, the caller
+gets QUEUED right away and hears about the delivery later"""
+
+import asyncio
+
+from app.nobetnode.base import QUEUED
+
+from .nodes import ban, connect, disconnected_node, drained
+
+
+def test_queued_until_the_node_is_back(certificate):
+    async def run():
+        node, stub = disconnected_node(certificate)
+        delivered = []
+        results = await node.BanUsers([ban("1.1.1.1"), ban("2.2.2.2")], 60,
+                                      on_delivered=delivered.append)
+
+        assert [(result.success, result.message) for result in results] == [(False, QUEUED)] * 2
+        await asyncio.sleep(0.05)
+        assert stub.calls == [] and delivered == []
+
+        connect(node)
+        await drained(node)
+        assert stub.calls == [("ban", ["1.1.1.1", "2.2.2.2"])]
+        assert [[result.success for result in results] for results in delivered] == [[True, True]]
+        await node.stop()
+
+    asyncio.run(run())
+
+
+def test_dropped_requests_are_reported(certificate):
+    async def run():
+        node, _ = disconnected_node(certificate)
+        delivered = []
+        await node.BanUsers([ban("1.1.1.1")], on_delivered=delivered.append)
+        await node.stop()
+        await asyncio.sleep(0)
+
+        assert delivered == [None]
+
+    asyncio.run(run())
+
+
+def test_connected_node_answers_with_the_results(certificate):
+    async def run():
+        node, stub = disconnected_node(certificate)
+        connect(node)
+        results = await node.UnBanUsers([ban("1.1.1.1")])
+
+        assert [result.success for result in results] == [True]
+        assert stub.calls == [("unban", ["1.1.1.1"])]
+        await node.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,140 @@
+"""RedisStorage against an in-process fake redis server, two storages on
+one server stand for two nobetci instances (STL=10, IUL=50)"""
+
+import asyncio
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from app.models.user import ConnectionEvent
+from app.storage import redis as redis_storage
+from app.storage.redis import RedisStorage
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(redis_storage.time, "time", clock)
+    return clock
+
+
+def instances(count: int = 2, window: int = 0) -> list[RedisStorage]:
+    server = FakeServer()
+    return [RedisStorage(FakeRedis(server=server, decode_responses=True), window)
+            for _ in range(count)]
+
+
+async def ips(storage: RedisStorage, name: str = "user") -> list[str]:
+    return [user.ip for user in await storage.get_users(name)]
+
+
+def test_instances_share_ips():
+    async def run():
+        first, second = instances()
+        await first.add_user(ConnectionEvent("user", "1.1.1.1", node="a"))
+        await second.add_users([ConnectionEvent("user", "2.2.2.2", node="b"),
+                                ConnectionEvent("user", "1.1.1.1", node="b")])
+
+        assert await ips(first) == await ips(second) == ["1.1.1.1", "2.2.2.2"]
+        # the first instance to see an ip keeps its details
+        assert (await second.get_user("user")).node == "a"
+        assert (await first.get_last_user("user")).node == "b"
+
+    asyncio.run(run())
+
+
+def test_ban_across_two_instances():
+    async def run():
+        first, second = instances()
+        # each instance watches other nodes and only sees one of the ips
+        assert await first.decide(ConnectionEvent("user", "1.1.1.1"), 1) is None
+        decisions = []
+        for _ in range(10):
+            decisions.append(await second.decide(ConnectionEvent("user", "2.2.2.2"), 1))
+            decisions.append(await first.decide(ConnectionEvent("user", "1.1.1.1"), 1))
+
+        assert decisions[:-1] == [False] * 19
+        user_to_ban, first_user = decisions[-1]
+        assert user_to_ban.ip == first_user.ip == "1.1.1.1"
+
+        # both instances forgot the first ip and start counting again
+        assert await ips(first) == await ips(second) == ["2.2.2.2"]
+        assert await second.decide(ConnectionEvent("user", "2.2.2.2"), 1) is None
+
+    asyncio.run(run())
+
+
+def test_reset_across_two_instances():
+    async def run():
+        first, second = instances()
+        await first.decide(ConnectionEvent("user", "1.1.1.1"), 1)
+        decisions = [await second.decide(ConnectionEvent("user", "2.2.2.2"), 1)
+                     for _ in range(51)]
+
+        assert decisions == [False] * 51
+        assert await ips(first) == ["2.2.2.2"]
+
+    asyncio.run(run())
+
+
+def test_window_expiry(clock):
+    async def run():
+        storage, = instances(1, window=10)
+        await storage.add_user(ConnectionEvent("user", "1.1.1.1"))
+        clock.now += 5
+        await storage.add_user(ConnectionEvent("user", "2.2.2.2"))
+
+        clock.now += 5
+        assert await ips(storage) == ["2.2.2.2"]
+        # an ip seen again stays
+        await storage.add_user(ConnectionEvent("user", "2.2.2.2"))
+        clock.now += 9
+        assert await ips(storage) == ["2.2.2.2"]
+        clock.now += 1
+        assert await ips(storage) == []
+
+    asyncio.run(run())
+
+
+def test_expired_ip_added_again_counts_as_new(clock):
+    async def run():
+        storage, = instances(1, window=10)
+        await storage.add_user(ConnectionEvent("user", "1.1.1.1", node="old"))
+        clock.now += 5
+        await storage.add_user(ConnectionEvent("user", "2.2.2.2"))
+        await storage.nextCount("user", "2.2.2.2")
+
+        clock.now += 7
+        assert await storage.decide(ConnectionEvent("user", "1.1.1.1", node="new"), 2) is None
+
+        # first seen again now, after the ip which didn't expire
+        assert await ips(storage) == ["2.2.2.2", "1.1.1.1"]
+        again = await storage.get_user_by_ip("user", "1.1.1.1")
+        assert (again.node, again.count) == ("new", 0)
+
+    asyncio.run(run())
+
+
+def test_keys_of_idle_users_expire():
+    async def run():
+        storage, = instances(1, window=10)
+        await storage.add_users([ConnectionEvent("user", "1.1.1.1"),
+                                 ConnectionEvent("user", "2.2.2.2")])
+        await storage.nextCount("user", "2.2.2.2")
+
+        redis = storage._redis
+        keys = sorted(await redis.keys("nobetci:*"))
+        assert keys == ["nobetci:count:user", "nobetci:ips:user", "nobetci:seen:user"]
+        for key in keys:
+            assert 0 < await redis.ttl(key) <= 10
+
+    asyncio.run(run())